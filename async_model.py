@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import time
+import traceback
+import psycopg2
+from psycopg2 import errors, extensions
+
+from model import DB_PARAMS, POOL_TIMEOUT, STATEMENTS, connection_params, report_error
+
+QUERY_TIMEOUT = 30.0
+
+
+async def wait_ready(conn):
+    # drive a psycopg2 async connection from the event loop instead of blocking on it
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            add, remove = loop.add_reader, loop.remove_reader
+        elif state == extensions.POLL_WRITE:
+            add, remove = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"unexpected poll() state: {state}")
+
+        fd = conn.fileno()
+        future = loop.create_future()
+        add(fd, lambda: future.done() or future.set_result(None))
+        try:
+            await future
+        finally:
+            remove(fd)
+
+
+class AsyncConnectionPool:
+    def __init__(self, minconn, maxconn, timeout=POOL_TIMEOUT, **conn_params):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: min={minconn}, max={maxconn}")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.conn_params = conn_params
+        self._slots = asyncio.Semaphore(maxconn)
+        self._idle = []
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+
+    async def _connect(self):
+        conn = psycopg2.connect(async_=True, **self.conn_params)
+        await wait_ready(conn)
+        return conn
+
+    async def open(self):
+        for _ in range(self.minconn):
+            self._idle.append(await self._connect())
+
+    async def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise
+
+        conn = None
+        while self._idle and conn is None:
+            conn = self._idle.pop()
+            if conn.closed:
+                conn = None
+        try:
+            if conn is None:
+                conn = await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._in_use += 1
+        self._checkouts += 1
+        return conn
+
+    def release(self, conn, close=False):
+        self._in_use -= 1
+        if close or conn.closed:
+            if not conn.closed:
+                conn.close()
+        else:
+            self._idle.append(conn)
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "min": self.minconn,
+            "max": self.maxconn,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "utilisation": self._in_use / self.maxconn,
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+        }
+
+    async def close(self):
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+
+
+class AsyncDatabase:
+    def __init__(self, pool_min=1, pool_max=10, pool_timeout=POOL_TIMEOUT, query_timeout=QUERY_TIMEOUT):
+        self.pool = AsyncConnectionPool(pool_min, pool_max, timeout=pool_timeout,
+                                         **connection_params(DB_PARAMS))
+        self.query_timeout = query_timeout
+        self.student_stats = None
+
+    async def connect(self):
+        try:
+            await self.pool.open()
+            print("Connected to PostgreSQL successfully! (async)")
+            return True
+        except Exception:
+            logging.error("Error connecting to PostgreSQL:\n" + traceback.format_exc())
+            print("Error: Failed to connect to database (details in db_errors.log).")
+            return False
+
+    async def close(self):
+        await self.pool.close()
+        print("Database connection pool closed.")
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    async def _run(self, conn, query, params, fetch):
+        # the cursor is not closed on cancellation: psycopg2 refuses close() while the
+        # async query is still running, and _cancel() drains it first
+        cur = conn.cursor()
+        cur.execute(query, params or ())
+        await wait_ready(conn)
+        rows = cur.fetchall() if fetch else None
+        cur.close()
+        return rows
+
+    async def _cancel(self, conn):
+        # stop the server-side query and drain the connection so it can be reused
+        try:
+            conn.cancel()
+            await wait_ready(conn)
+            return True
+        except errors.QueryCanceled:
+            return True
+        except Exception:
+            logging.error("Error cancelling query:\n" + traceback.format_exc())
+            return False
+
+    async def execute(self, query, params=None, fetch=False, report_time=False, timeout=None):
+        # async connections autocommit, so there is no commit step here
+        default = [] if fetch else None
+        timeout = self.query_timeout if timeout is None else timeout
+        try:
+            conn = await self.pool.acquire()
+        except Exception:
+            logging.error("Error checking out pooled connection:\n" + traceback.format_exc())
+            print("Error: no free database connection (details in db_errors.log).")
+            return (default, None) if report_time else default
+
+        discard = False
+        start_time = time.monotonic()
+        try:
+            rows = await asyncio.wait_for(self._run(conn, query, params, fetch), timeout)
+            duration_ms = (time.monotonic() - start_time) * 1000
+            return (rows, duration_ms) if report_time else rows
+        except asyncio.TimeoutError:
+            discard = not await self._cancel(conn)
+            logging.error(f"Query timed out after {timeout}s:\n{query}")
+            print(f"Error: query timed out after {timeout}s and was cancelled.")
+        except asyncio.CancelledError:
+            discard = not await self._cancel(conn)
+            raise
+        except Exception as e:
+            report_error(e)
+        finally:
+            self.pool.release(conn, close=discard)
+
+        return (default, None) if report_time else default
+
+    async def add_student(self, name, email, group_name):
+        res = await self.execute(STATEMENTS['add_student'], (name, email, group_name), fetch=True)
+        if res:
+            new_id = res[0][0]
+            print(f"Added student id={new_id}")
+            return new_id
+        return None
+
+    async def edit_student(self, student_id, name, email, group_name):
+        await self.execute(STATEMENTS['edit_student'], (name, email, group_name, student_id))
+
+    async def delete_student(self, student_id):
+        count = await self.execute(STATEMENTS['count_student_projects'], (student_id,), fetch=True)
+        if count and count[0][0] > 0:
+            print(
+                f"Error: Unable to delete student (ID: {student_id}). "
+                f"He/She has {count[0][0]} related projects."
+            )
+            return
+        await self.execute(STATEMENTS['delete_student'], (student_id,))
+
+    async def get_students(self):
+        return await self.execute(STATEMENTS['get_students'], (None,), fetch=True)
+
+    async def add_supervisor(self, name, department, email):
+        res = await self.execute(STATEMENTS['add_supervisor'], (name, department, email), fetch=True)
+        if res:
+            new_id = res[0][0]
+            print(f"Added supervisor id={new_id}")
+            return new_id
+        return None
+
+    async def edit_supervisor(self, supervisor_id, name, department, email):
+        await self.execute(STATEMENTS['edit_supervisor'], (name, department, email, supervisor_id))
+
+    async def delete_supervisor(self, supervisor_id):
+        count = await self.execute(STATEMENTS['count_supervisor_projects'], (supervisor_id,), fetch=True)
+        if count and count[0][0] > 0:
+            print(
+                f"Error: Unable to delete supervisor (ID: {supervisor_id}). "
+                f"He/She has {count[0][0]} related projects."
+            )
+            return
+        await self.execute(STATEMENTS['delete_supervisor'], (supervisor_id,))
+
+    async def get_supervisors(self):
+        return await self.execute(STATEMENTS['get_supervisors'], (None,), fetch=True)
+
+    async def add_project(self, title, start_date, status, grade, supervisor_id, student_id):
+        res = await self.execute(
+            STATEMENTS['add_project'], (title, start_date, status, grade, supervisor_id, student_id), fetch=True
+        )
+        if res:
+            new_id = res[0][0]
+            print(f"Added project id={new_id}")
+            return new_id
+        return None
+
+    async def edit_project(self, project_id, title, start_date, status, grade, supervisor_id, student_id):
+        await self.execute(
+            STATEMENTS['edit_project'], (title, start_date, status, grade, supervisor_id, student_id, project_id)
+        )
+
+    async def delete_project(self, project_id):
+        await self.execute(STATEMENTS['delete_project'], (project_id,))
+
+    async def get_projects(self):
+        return await self.execute(STATEMENTS['get_projects'], (None,), fetch=True)
+
+    async def _uses_student_stats(self):
+        if self.student_stats is None:
+            rows = await self.execute(
+                "SELECT to_regclass('public.student_project_stats') IS NOT NULL "
+                "AND EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'student_project_stats_ins');",
+                fetch=True
+            )
+            if not rows:
+                return False
+            self.student_stats = rows[0][0]
+        return self.student_stats
+
+    async def search_1_projects_by_grade_and_student_name(self, min_grade, max_grade, name_pattern,
+                                                          timeout=None):
+        return await self.execute(
+            STATEMENTS['search_1'],
+            (min_grade, max_grade, name_pattern, None),
+            fetch=True,
+            report_time=True,
+            timeout=timeout
+        )
+
+    async def search_2_projects_by_date_and_supervisor_department(self, start_date, end_date, dept_pattern,
+                                                                  timeout=None):
+        return await self.execute(
+            STATEMENTS['search_2'],
+            (start_date, end_date, dept_pattern, None),
+            fetch=True,
+            report_time=True,
+            timeout=timeout
+        )
+
+    async def search_3_students_stats_by_project_status(self, status_pattern, min_avg_grade, timeout=None):
+        name = 'search_3_stats' if await self._uses_student_stats() else 'search_3'
+        return await self.execute(
+            STATEMENTS[name],
+            (status_pattern, min_avg_grade, None),
+            fetch=True,
+            report_time=True,
+            timeout=timeout
+        )
+
+    async def run_searches(self, search_1_params, search_2_params, search_3_params, timeout=None):
+        # the three searches run concurrently on separate pooled connections
+        results = await asyncio.gather(
+            self.search_1_projects_by_grade_and_student_name(*search_1_params, timeout=timeout),
+            self.search_2_projects_by_date_and_supervisor_department(*search_2_params, timeout=timeout),
+            self.search_3_students_stats_by_project_status(*search_3_params, timeout=timeout),
+        )
+        return dict(zip(('search_1', 'search_2', 'search_3'), results))
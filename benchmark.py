@@ -0,0 +1,180 @@
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import date, datetime
+from io import StringIO
+
+from model import Database
+
+SCALES = (10_000, 100_000, 1_000_000, 10_000_000)
+RUNS = 20
+WARMUP = 3
+THRESHOLD = 0.2
+SEED = 42
+
+SEARCH_METHODS = {
+    'search_1': 'search_1_projects_by_grade_and_student_name',
+    'search_2': 'search_2_projects_by_date_and_supervisor_department',
+    'search_3': 'search_3_students_stats_by_project_status',
+}
+
+# fixed parameter matrix so runs at different times are comparable
+PARAM_MATRIX = {
+    'search_1': [
+        (60, 100, '%Ivan%'),
+        (90, 100, '%'),
+        (60, 70, 'Maryna%'),
+    ],
+    'search_2': [
+        (date(2025, 1, 1), date(2025, 1, 31), 'F%'),
+        (date(2025, 1, 1), date(2025, 6, 30), '%'),
+        (date(2025, 3, 1), date(2025, 3, 7), 'FIOT'),
+    ],
+    'search_3': [
+        ('completed', 75),
+        ('%', 60),
+        ('active', 0),
+    ],
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def run_case(db, search, params, runs, warmup):
+    method = getattr(db, SEARCH_METHODS[search])
+    for _ in range(warmup):
+        method(*params)
+
+    timings = []
+    rows = 0
+    errors = 0
+    for _ in range(runs):
+        result, duration_ms = method(*params)
+        if duration_ms is None:
+            errors += 1
+            continue
+        timings.append(duration_ms)
+        rows = len(result)
+
+    return {
+        'search': search,
+        'params': [str(p) for p in params],
+        'rows': rows,
+        'runs': len(timings),
+        'errors': errors,
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'p99_ms': percentile(timings, 99),
+        'min_ms': min(timings) if timings else None,
+        'max_ms': max(timings) if timings else None,
+    }
+
+
+def run_benchmark(db, scales, runs=RUNS, warmup=WARMUP, workers=1):
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'runs': runs,
+        'warmup': warmup,
+        'scales': {},
+    }
+    for scale in scales:
+        print(f"Scale {scale}: generating data...")
+        start_time = time.monotonic()
+        with redirect_stdout(StringIO()):
+            generated = db.generate_random_data(scale, seed=SEED, workers=workers)
+        generate_s = time.monotonic() - start_time
+        if not generated:
+            print(f"  data generation failed (details in db_errors.log); scale {scale} skipped.")
+            continue
+
+        cases = {}
+        for search, matrix in PARAM_MATRIX.items():
+            for i, params in enumerate(matrix):
+                case = run_case(db, search, params, runs, warmup)
+                cases[f"{search}[{i}]"] = case
+                print(
+                    f"  {search}[{i}]: p50 {case['p50_ms'] or 0:.2f} ms, "
+                    f"p95 {case['p95_ms'] or 0:.2f} ms, p99 {case['p99_ms'] or 0:.2f} ms, "
+                    f"{case['rows']} rows"
+                )
+        report['scales'][str(scale)] = {'generate_s': generate_s, 'cases': cases}
+    return report
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    regressions = []
+    for scale, data in report['scales'].items():
+        base_scale = baseline.get('scales', {}).get(scale)
+        if base_scale is None:
+            continue
+        for key, case in data['cases'].items():
+            base_case = base_scale['cases'].get(key)
+            if base_case is None:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+                old, new = base_case.get(metric), case.get(metric)
+                if old and new is not None and new > old * (1 + threshold):
+                    regressions.append({
+                        'scale': scale,
+                        'case': key,
+                        'metric': metric,
+                        'baseline': old,
+                        'current': new,
+                        'change': new / old - 1,
+                    })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search query benchmark across data sizes.")
+    parser.add_argument("--scales", default=",".join(str(s) for s in SCALES[:3]),
+                        help="comma-separated student counts passed to generate_random_data")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--workers", type=int, default=1, help="data generation processes")
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown before a case counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    db = Database()
+    try:
+        report = run_benchmark(db, scales, args.runs, args.warmup, args.workers)
+    finally:
+        db.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    for r in regressions:
+        print(
+            f"REGRESSION scale={r['scale']} {r['case']} {r['metric']}: "
+            f"{r['baseline']:.2f} -> {r['current']:.2f} ms (+{r['change'] * 100:.0f}%)"
+        )
+    if regressions:
+        return 1
+    print(f"No regressions above {args.threshold * 100:.0f}%.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
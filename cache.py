@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_entries=256, ttl=60.0, ttls=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value, cost_ms)
+        self._versions = {}  # table -> number of invalidations so far
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_ms = 0.0
+
+    def token(self, tables):
+        # remembered before a read so a write that lands during the read is not cached over
+        with self._lock:
+            return tuple(self._versions.get(t, 0) for t in tables)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, _, value, cost_ms = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += cost_ms
+            return True, value
+
+    def put(self, key, tables, value, cost_ms, token, ttl_name=None):
+        ttl = self.ttls.get(ttl_name, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if tuple(self._versions.get(t, 0) for t in tables) != token:
+                return
+            self._entries[key] = (time.monotonic() + ttl, frozenset(tables), value, cost_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry[1] & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "saved_ms": self.saved_ms,
+            }
@@ -1,7 +1,9 @@
-from model import Database
+from model import Database, COPY_FORMATS, IMPORT_ORDER, TABLE_COLUMNS, DEFAULT_SEARCH_PARAMS, PARTITION_INTERVALS
 from view import View
 from datetime import datetime
 
+PAGE_SIZE = 50
+
 class Controller:
     def __init__(self):
         self.db = Database()
@@ -38,6 +40,228 @@ class Controller:
                 continue
             return s
 
+    def input_search_1_params(self):
+        min_g = self.input_int("Min grade: ", min_value=0, max_value=100)
+        max_g = self.input_int("Max grade: ", min_value=0, max_value=100)
+        name_pat = input("Student name pattern (use % for LIKE): ")
+        return min_g, max_g, name_pat
+
+    def input_search_2_params(self):
+        start = self.input_date("Start date (YYYY-MM-DD): ")
+        end = self.input_date("End date (YYYY-MM-DD): ")
+        dept_pat = input("Department pattern (use % for LIKE): ")
+        return start, end, dept_pat
+
+    def input_search_3_params(self):
+        status_pat = input("Project status pattern (use % for LIKE): ")
+        min_avg = self.input_int("Min average grade: ", min_value=0, max_value=100)
+        return status_pat, min_avg
+
+    def input_copy_format(self):
+        while True:
+            fmt = input("Format (csv/binary) [csv]: ").strip().lower() or "csv"
+            if fmt in COPY_FORMATS:
+                return fmt
+            print("Unknown format. Use csv or binary.")
+
+    def copy_data(self):
+        mode = input("1 - export table, 2 - import tables, 3 - export search result: ").strip()
+        fmt = self.input_copy_format()
+        try:
+            if mode == "1":
+                table = input(f"Table ({'/'.join(IMPORT_ORDER)}): ").strip().lower()
+                if table not in TABLE_COLUMNS:
+                    print("Unknown table.")
+                    return
+                path = self.input_str_nonempty("Output file: ")
+                with open(path, "wb") as f:
+                    count = self.db.export_table(table, f, fmt)
+                if count is not None:
+                    print(f"Exported {count} rows from {table} to {path}.")
+
+            elif mode == "2":
+                paths = {}
+                for table in IMPORT_ORDER:
+                    path = input(f"File for {table} (empty to skip): ").strip()
+                    if path:
+                        paths[table] = path
+                files = {table: open(path, "rb") for table, path in paths.items()}
+                try:
+                    self.db.import_tables(files, fmt)
+                finally:
+                    for f in files.values():
+                        f.close()
+
+            elif mode == "3":
+                number = self.input_int("Search number (1-3): ", min_value=1, max_value=3)
+                params = getattr(self, f"input_search_{number}_params")()
+                path = self.input_str_nonempty("Output file: ")
+                with open(path, "wb") as f:
+                    count = self.db.export_search(number, params, f, fmt)
+                if count is not None:
+                    print(f"Exported {count} rows of search {number} to {path}.")
+
+            else:
+                print("Wrong choice!")
+        except OSError as e:
+            print(f"File error: {e}")
+
+    def print_query_time(self, dur):
+        print(f"Query time (first page): {dur:.2f} ms")
+        stats = self.db.cache_stats()
+        if stats:
+            print(
+                f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['saved_ms']:.2f} ms saved"
+            )
+
+    def toggle_cache(self):
+        if self.db.cache:
+            self.db.disable_cache()
+            print("Result cache disabled.")
+        else:
+            size = self.input_int("Max cached results: ", min_value=1)
+            ttl = self.input_int("Time to live (seconds): ", min_value=1)
+            self.db.enable_cache(size, ttl)
+            print("Result cache enabled.")
+
+    def input_all_search_params(self):
+        if input("Use default search parameters? [Y/n]: ").strip().lower() != "n":
+            return DEFAULT_SEARCH_PARAMS
+        return {
+            'search_1': self.input_search_1_params(),
+            'search_2': self.input_search_2_params(),
+            'search_3': self.input_search_3_params(),
+        }
+
+    def manage_indexes(self):
+        mode = input("1 - status, 2 - create, 3 - drop, 4 - advisor: ").strip()
+        if mode == "1":
+            for name, present in self.db.index_status().items():
+                print(f"{name}: {'present' if present else 'missing'}")
+        elif mode == "2":
+            self.db.create_indexes()
+        elif mode == "3":
+            self.db.drop_indexes()
+        elif mode == "4":
+            advice = self.db.advise_indexes(self.input_all_search_params())
+            self.view.show_index_advice(advice)
+        else:
+            print("Wrong choice!")
+
+    def slow_query_log(self):
+        state = f"on, threshold {self.db.slow_query_ms} ms" if self.db.slow_query_ms is not None else "off"
+        mode = input(f"Slow query log is {state}. 1 - enable, 2 - disable, 3 - show slowest: ").strip()
+        if mode == "1":
+            threshold = self.input_int("Threshold (ms): ", min_value=0)
+            self.db.enable_slow_query_log(threshold)
+            print("Slow queries will be written to slow_queries.log.")
+        elif mode == "2":
+            self.db.disable_slow_query_log()
+            print("Slow query log disabled.")
+        elif mode == "3":
+            n = self.input_int("How many queries to show?: ", min_value=1)
+            self.view.show_slow_queries(self.db.slowest_queries(n))
+        else:
+            print("Wrong choice!")
+
+    def student_stats(self):
+        mode = input("1 - install, 2 - check consistency, 3 - rebuild, 4 - drop: ").strip()
+        if mode == "1":
+            self.db.install_student_stats()
+        elif mode == "2":
+            mismatches = self.db.check_student_stats()
+            if mismatches is None:
+                return
+            if mismatches:
+                print(f"{len(mismatches)} mismatching rows "
+                      "(student_id, status, live/summary count, sum, graded):")
+                self.view.show_data(mismatches, self.db.last_columns())
+            else:
+                print("Summary matches the live aggregate.")
+        elif mode == "3":
+            self.db.rebuild_student_stats()
+        elif mode == "4":
+            self.db.drop_student_stats()
+        else:
+            print("Wrong choice!")
+
+    def manage_partitions(self):
+        mode = input("1 - partition project by start_date, 2 - list partitions, 3 - detach old partitions: ").strip()
+        if mode == "1":
+            interval = input(f"Interval ({'/'.join(PARTITION_INTERVALS)}) [month]: ").strip().lower() or "month"
+            if interval not in PARTITION_INTERVALS:
+                print("Wrong choice!")
+                return
+            self.db.partition_projects(interval)
+        elif mode == "2":
+            self.view.show_data(self.db.project_partitions(), ('partition', 'from', 'to', 'est_rows'))
+        elif mode == "3":
+            before = self.input_date("Detach partitions ending on or before (YYYY-MM-DD): ")
+            self.db.detach_project_partitions(before)
+        else:
+            print("Wrong choice!")
+
+    def manage_metrics(self):
+        state = "on" if self.db.metrics else "off"
+        mode = input(f"Metrics are {state}. 1 - enable, 2 - show, 3 - disable: ").strip()
+        if mode == "1":
+            port = input("Prometheus port (empty - no endpoint): ").strip()
+            dump_path = input("JSON dump file (empty - no dump): ").strip()
+            if port and not port.isdigit():
+                print("Wrong port!")
+                return
+            if self.db.enable_metrics(int(port) if port else None, dump_path or None):
+                print("Metrics enabled.")
+        elif mode == "2":
+            self.view.show_metrics(self.db.metrics_snapshot())
+        elif mode == "3":
+            self.db.disable_metrics()
+            print("Metrics disabled.")
+        else:
+            print("Wrong choice!")
+
+    def watch_changes(self):
+        table = input(f"Table ({'/'.join(IMPORT_ORDER)}): ").strip().lower()
+        if table not in TABLE_COLUMNS:
+            print("Unknown table.")
+            return
+        load = getattr(self.db, f"get_{table}s")
+        with self.db.listen_changes([table]) as feed:
+            rows = {row[0]: row for page in load(page_size=PAGE_SIZE * 20) for row in page}
+            print(f"Watching {table} ({len(rows)} rows loaded), Ctrl+C to stop.")
+            try:
+                for event in feed.events():
+                    if not self.db.apply_change(rows, event):
+                        rows = {row[0]: row for page in load(page_size=PAGE_SIZE * 20) for row in page}
+                    self.view.show_change(event, rows, self.db.last_columns)
+            except KeyboardInterrupt:
+                print(f"\nStopped after {feed.received} events.")
+
+    def manage_change_feed(self):
+        mode = input("1 - install, 2 - watch a table, 3 - drop: ").strip()
+        if mode == "1":
+            self.db.install_change_feed()
+        elif mode == "2":
+            if not self.db.change_feed_installed():
+                print("Change feed is not installed.")
+                return
+            self.watch_changes()
+        elif mode == "3":
+            self.db.drop_change_feed()
+        else:
+            print("Wrong choice!")
+
+    def manage_server_functions(self):
+        state = "installed" if self.db.server_functions_installed() else "not installed"
+        mode = input(f"Server-side functions are {state}. 1 - install, 2 - drop: ").strip()
+        if mode == "1":
+            self.db.install_server_functions()
+        elif mode == "2":
+            self.db.drop_server_functions()
+        else:
+            print("Wrong choice!")
+
     def run(self):
         while True:
             self.view.show_menu()
@@ -49,16 +273,16 @@ class Controller:
                 break
 
             elif choice == "1":
-                rows = self.db.get_students()
-                self.view.show_data(rows)
+                pages = self.db.get_students(page_size=PAGE_SIZE)
+                self.view.show_pages(pages, self.db.last_columns)
 
             elif choice == "2":
-                rows = self.db.get_supervisors()
-                self.view.show_data(rows)
+                pages = self.db.get_supervisors(page_size=PAGE_SIZE)
+                self.view.show_pages(pages, self.db.last_columns)
 
             elif choice == "3":
-                rows = self.db.get_projects()
-                self.view.show_data(rows)
+                pages = self.db.get_projects(page_size=PAGE_SIZE)
+                self.view.show_pages(pages, self.db.last_columns)
 
             elif choice == "4":
                 name = self.input_str_nonempty("Student name: ")
@@ -130,49 +354,77 @@ class Controller:
                 self.db.delete_project(pid)
 
             elif choice == "13":
-                count = self.input_int("How many rows to generate?: ", min_value=1)
-                self.db.generate_random_data(count)
+                count = self.input_int("How many students to generate?: ", min_value=1)
+                seed = input("Seed (empty for random): ").strip()
+                workers = self.input_int("Worker processes: ", min_value=1)
+                append = input("Append to existing data? [y/N]: ").strip().lower() == "y"
+                self.db.generate_random_data(
+                    count, seed=int(seed) if seed.lstrip("-").isdigit() else None,
+                    workers=workers, append=append
+                )
 
             elif choice == "14":
-                min_g = self.input_int("Min grade: ", min_value=0, max_value=100)
-                max_g = self.input_int("Max grade: ", min_value=0, max_value=100)
-                name_pat = input("Student name pattern (use % for LIKE): ")
-                rows, dur = self.db.search_1_projects_by_grade_and_student_name(
-                    min_g, max_g, name_pat
+                min_g, max_g, name_pat = self.input_search_1_params()
+                pages, dur = self.db.search_1_projects_by_grade_and_student_name(
+                    min_g, max_g, name_pat, page_size=PAGE_SIZE
                 )
                 print(
                     f"\n=== RESULTS FOR grade {min_g}..{max_g} "
                     f"AND student name ILIKE '{name_pat}' ==="
                 )
-                self.view.show_data(rows)
-                print(f"Query time: {dur:.2f} ms\n")
+                self.print_query_time(dur)
+                self.view.show_pages(pages, self.db.last_columns)
 
             elif choice == "15":
-                start = self.input_date("Start date (YYYY-MM-DD): ")
-                end = self.input_date("End date (YYYY-MM-DD): ")
-                dept_pat = input("Department pattern (use % for LIKE): ")
-                rows, dur = self.db.search_2_projects_by_date_and_supervisor_department(
-                    start, end, dept_pat
+                start, end, dept_pat = self.input_search_2_params()
+                pages, dur = self.db.search_2_projects_by_date_and_supervisor_department(
+                    start, end, dept_pat, page_size=PAGE_SIZE
                 )
                 print(
                     f"\n=== RESULTS FOR date {start}..{end} "
                     f"AND department ILIKE '{dept_pat}' ==="
                 )
-                self.view.show_data(rows)
-                print(f"Query time: {dur:.2f} ms\n")
+                self.print_query_time(dur)
+                self.view.show_pages(pages, self.db.last_columns)
 
             elif choice == "16":
-                status_pat = input("Project status pattern (use % for LIKE): ")
-                min_avg = self.input_int("Min average grade: ", min_value=0, max_value=100)
-                rows, dur = self.db.search_3_students_stats_by_project_status(
-                    status_pat, min_avg
+                status_pat, min_avg = self.input_search_3_params()
+                pages, dur = self.db.search_3_students_stats_by_project_status(
+                    status_pat, min_avg, page_size=PAGE_SIZE
                 )
                 print(
                     f"\n=== RESULTS FOR status ILIKE '{status_pat}' "
                     f"AND avg_grade >= {min_avg} ==="
                 )
-                self.view.show_data(rows)
-                print(f"Query time: {dur:.2f} ms\n")
+                self.print_query_time(dur)
+                self.view.show_pages(pages, self.db.last_columns)
+
+            elif choice == "17":
+                self.copy_data()
+
+            elif choice == "18":
+                self.toggle_cache()
+
+            elif choice == "19":
+                self.manage_indexes()
+
+            elif choice == "20":
+                self.slow_query_log()
+
+            elif choice == "21":
+                self.student_stats()
+
+            elif choice == "22":
+                self.manage_partitions()
+
+            elif choice == "23":
+                self.manage_metrics()
+
+            elif choice == "24":
+                self.manage_change_feed()
+
+            elif choice == "25":
+                self.manage_server_functions()
 
             else:
                 print("Wrong choice! Try again.")
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+from benchmark import PARAM_MATRIX, percentile
+from model import Database
+
+WORKERS = 8
+DURATION = 30.0
+SEED = 42
+PAGE_SIZE = 50
+
+# relative weights of each operation category
+DEFAULT_MIX = {'get': 10, 'search': 50, 'add': 15, 'edit': 15, 'delete': 10}
+
+# upper bounds in ms of the latency histogram buckets
+HISTOGRAM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation category: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def histogram(timings):
+    counts = Counter()
+    for ms in timings:
+        for bound in HISTOGRAM_BUCKETS:
+            if ms <= bound:
+                counts[f"<={bound}ms"] += 1
+                break
+        else:
+            counts[f">{HISTOGRAM_BUCKETS[-1]}ms"] += 1
+    labels = [f"<={b}ms" for b in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}ms"]
+    return {label: counts[label] for label in labels}
+
+
+class LoadGenerator:
+    def __init__(self, db, mix=None, workers=WORKERS, duration=DURATION, max_ops=None, seed=SEED):
+        self.db = db
+        self.mix = mix or DEFAULT_MIX
+        self.workers = workers
+        self.duration = duration
+        self.max_ops = max_ops
+        self.seed = seed
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ops_started = 0
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.max_ids = {}
+
+    def _load_max_ids(self):
+        rows = self.db.execute(
+            "SELECT (SELECT COALESCE(MAX(student_id), 0) FROM public.student), "
+            "(SELECT COALESCE(MAX(supervisor_id), 0) FROM public.supervisor), "
+            "(SELECT COALESCE(MAX(project_id), 0) FROM public.project);",
+            fetch=True
+        )
+        student, supervisor, project = rows[0] if rows else (0, 0, 0)
+        self.max_ids = {'student': max(student, 1), 'supervisor': max(supervisor, 1), 'project': max(project, 1)}
+
+    def _random_id(self, rng, table):
+        return rng.randint(1, self.max_ids[table])
+
+    def _random_project(self, rng):
+        status = rng.choice(('active', 'completed'))
+        return (
+            f"Load project {rng.randint(1, 10 ** 9)}",
+            date(2025, 1, 1) + timedelta(days=rng.randint(0, 180)),
+            status,
+            rng.randint(60, 100) if status == 'completed' else None,
+            self._random_id(rng, 'supervisor'),
+            self._random_id(rng, 'student'),
+        )
+
+    def _operations(self, rng):
+        db = self.db
+        tag = lambda: rng.randint(1, 10 ** 9)
+        return {
+            'get': {
+                'get_students': lambda: next(iter(db.get_students(page_size=PAGE_SIZE)), None),
+                'get_supervisors': lambda: next(iter(db.get_supervisors(page_size=PAGE_SIZE)), None),
+                'get_projects': lambda: next(iter(db.get_projects(page_size=PAGE_SIZE)), None),
+            },
+            'search': {
+                'search_1': lambda: db.search_1_projects_by_grade_and_student_name(
+                    *rng.choice(PARAM_MATRIX['search_1'])),
+                'search_2': lambda: db.search_2_projects_by_date_and_supervisor_department(
+                    *rng.choice(PARAM_MATRIX['search_2'])),
+                'search_3': lambda: db.search_3_students_stats_by_project_status(
+                    *rng.choice(PARAM_MATRIX['search_3'])),
+            },
+            'add': {
+                'add_student': lambda: db.add_student(
+                    'Load Student', f"load{tag()}@lll.kpi.ua", 'КВ-31'),
+                'add_supervisor': lambda: db.add_supervisor(
+                    'Load Supervisor', 'FIOT', f"load{tag()}@lll.kpi.ua"),
+                'add_project': lambda: db.add_project(*self._random_project(rng)),
+            },
+            'edit': {
+                'edit_student': lambda: db.edit_student(
+                    self._random_id(rng, 'student'), 'Load Student', f"load{tag()}@lll.kpi.ua", 'КВ-32'),
+                'edit_supervisor': lambda: db.edit_supervisor(
+                    self._random_id(rng, 'supervisor'), 'Load Supervisor', 'FPM', f"load{tag()}@lll.kpi.ua"),
+                'edit_project': lambda: db.edit_project(
+                    self._random_id(rng, 'project'), *self._random_project(rng)),
+            },
+            'delete': {
+                'delete_student': lambda: db.delete_student(self._random_id(rng, 'student')),
+                'delete_supervisor': lambda: db.delete_supervisor(self._random_id(rng, 'supervisor')),
+                'delete_project': lambda: db.delete_project(self._random_id(rng, 'project')),
+            },
+        }
+
+    def _next_op_allowed(self):
+        if self._stop.is_set():
+            return False
+        if self.max_ops is None:
+            return True
+        with self._lock:
+            if self._ops_started >= self.max_ops:
+                return False
+            self._ops_started += 1
+            return True
+
+    def _worker(self, index):
+        rng = random.Random(self.seed * 1000 + index)
+        operations = self._operations(rng)
+        categories = list(self.mix)
+        weights = [self.mix[c] for c in categories]
+        timings = defaultdict(list)
+        errors = defaultdict(Counter)
+
+        while self._next_op_allowed():
+            category = rng.choices(categories, weights)[0]
+            name, operation = rng.choice(list(operations[category].items()))
+            start_time = time.monotonic()
+            try:
+                operation()
+                kind = self.db.last_error()
+            except Exception as e:
+                kind = type(e).__name__
+            timings[name].append((time.monotonic() - start_time) * 1000)
+            if kind:
+                errors[name][kind] += 1
+
+        with self._lock:
+            for name, values in timings.items():
+                self.timings[name].extend(values)
+            for name, counts in errors.items():
+                self.errors[name].update(counts)
+
+    def run(self):
+        self._load_max_ids()
+        threads = [threading.Thread(target=self._worker, args=(i,), daemon=True)
+                   for i in range(self.workers)]
+        start_time = time.monotonic()
+        for t in threads:
+            t.start()
+        if self.max_ops is None:
+            self._stop.wait(self.duration)
+            self._stop.set()
+        for t in threads:
+            t.join()
+        return self.report(time.monotonic() - start_time)
+
+    def report(self, elapsed):
+        operations = {}
+        total = 0
+        total_errors = 0
+        for name in sorted(self.timings):
+            timings = self.timings[name]
+            errors = dict(self.errors.get(name, {}))
+            total += len(timings)
+            total_errors += sum(errors.values())
+            operations[name] = {
+                'count': len(timings),
+                'ops_per_sec': len(timings) / elapsed if elapsed else None,
+                'errors': errors,
+                'p50_ms': percentile(timings, 50),
+                'p95_ms': percentile(timings, 95),
+                'p99_ms': percentile(timings, 99),
+                'max_ms': max(timings) if timings else None,
+                'histogram': histogram(timings),
+            }
+        return {
+            'workers': self.workers,
+            'mix': self.mix,
+            'elapsed_s': elapsed,
+            'total_ops': total,
+            'total_errors': total_errors,
+            'ops_per_sec': total / elapsed if elapsed else None,
+            'operations': operations,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent mixed read/write load against the database.")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds to run")
+    parser.add_argument("--ops", type=int, help="stop after this many operations instead of --duration")
+    parser.add_argument("--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="category weights, e.g. get=10,search=50,add=15,edit=15,delete=10")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--primary", help="primary DSN (default: model.DB_PARAMS)")
+    parser.add_argument("--replica", action="append", default=[],
+                        help="replica DSN for get/search reads; repeat for several replicas")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port during the run")
+    parser.add_argument("--metrics-json", help="dump per-method metrics to this JSON file")
+    args = parser.parse_args(argv)
+
+    # per-operation prints from Database would swamp the report
+    with open(os.devnull, "w") as devnull:
+        with redirect_stdout(devnull):
+            db = Database(pool_min=1, pool_max=args.workers, primary=args.primary, replicas=args.replica)
+            connected = db.connect()
+        if not connected:
+            print("Error: Failed to connect to database (details in db_errors.log).", file=sys.stderr)
+            return 1
+
+        if args.metrics_port is not None or args.metrics_json:
+            with redirect_stdout(devnull):
+                db.enable_metrics(args.metrics_port, args.metrics_json)
+
+        generator = LoadGenerator(db, parse_mix(args.mix), args.workers, args.duration, args.ops, args.seed)
+        try:
+            with redirect_stdout(devnull):
+                report = generator.run()
+            if db.replicas:
+                report['replicas'] = db.replica_stats()
+        finally:
+            with redirect_stdout(devnull):
+                db.close()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
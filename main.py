@@ -1,5 +1,14 @@
+import argparse
+
 from controller import Controller
+from render import OUTPUT_FORMATS
+from view import View
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Student projects database.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table",
+                        help="how result rows are printed; csv/jsonl suit piping")
+    args = parser.parse_args()
+    View.output_format = args.format
     app = Controller()
-    app.run()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,150 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds in seconds, as Prometheus histograms expect
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DUMP_INTERVAL = 60.0
+ERROR_KINDS = ('ForeignKeyViolation', 'UniqueViolation', 'other')
+
+
+class MethodStats:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.errors = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.seconds = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self._stats = defaultdict(MethodStats)
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._server = None
+        self._dump_stop = None
+        self._dump_thread = None
+
+    def observe(self, method, duration_ms, rows=0, error=None):
+        seconds = duration_ms / 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            stats = self._stats[method]
+            stats.calls += 1
+            stats.rows += max(rows, 0)
+            stats.buckets[bucket] += 1
+            stats.seconds += seconds
+            if error is not None:
+                stats.errors[error] += 1
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            methods = {}
+            for method, stats in sorted(self._stats.items()):
+                methods[method] = {
+                    'calls': stats.calls,
+                    'rows': stats.rows,
+                    'errors': {kind: stats.errors[kind] for kind in ERROR_KINDS},
+                    'total_ms': stats.seconds * 1000,
+                    'avg_ms': stats.seconds * 1000 / stats.calls if stats.calls else None,
+                    'histogram_ms': {
+                        f"<={bound * 1000:g}": count
+                        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), stats.buckets)
+                    },
+                }
+            return {'since': self.started_at, 'at': time.time(), 'methods': methods}
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP db_queries_total Statements run by Database, by calling method.",
+            "# TYPE db_queries_total counter",
+        ]
+        with self._lock:
+            items = sorted(self._stats.items())
+            for method, stats in items:
+                lines.append(f'db_queries_total{{method="{method}"}} {stats.calls}')
+
+            lines += ["# HELP db_query_errors_total Failed statements by error kind.",
+                      "# TYPE db_query_errors_total counter"]
+            for method, stats in items:
+                for kind in ERROR_KINDS:
+                    lines.append(f'db_query_errors_total{{method="{method}",kind="{kind}"}} {stats.errors[kind]}')
+
+            lines += ["# HELP db_query_rows_total Rows returned or affected.",
+                      "# TYPE db_query_rows_total counter"]
+            for method, stats in items:
+                lines.append(f'db_query_rows_total{{method="{method}"}} {stats.rows}')
+
+            lines += ["# HELP db_query_duration_seconds Statement latency.",
+                      "# TYPE db_query_duration_seconds histogram"]
+            for method, stats in items:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'db_query_duration_seconds_bucket{{method="{method}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'db_query_duration_seconds_bucket{{method="{method}",le="+Inf"}} {stats.calls}')
+                lines.append(f'db_query_duration_seconds_sum{{method="{method}"}} {stats.seconds}')
+                lines.append(f'db_query_duration_seconds_count{{method="{method}"}} {stats.calls}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        # GET /metrics in Prometheus text format from a daemon thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def dump(self, path):
+        # written next to the target and renamed, so readers never see half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_dump(self, path, interval=DUMP_INTERVAL):
+        stop = self._dump_stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self._dump_thread = threading.Thread(target=loop, daemon=True)
+        self._dump_thread.start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._dump_stop is not None:
+            # the dump thread writes one last file on its way out
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_stop = None
@@ -2,7 +2,27 @@ import psycopg2
 import time
 import logging
 import traceback
-from psycopg2 import errors
+import itertools
+import threading
+import functools
+import re
+import weakref
+import heapq
+import math
+import multiprocessing
+import random
+import io
+import json
+import os
+import select
+import configparser
+from datetime import date, timedelta
+from contextlib import contextmanager, redirect_stdout
+from psycopg2 import errors, extensions
+from psycopg2.extras import execute_values
+from pool import ConnectionPool, PoolTimeout
+from cache import QueryCache
+from metrics import DUMP_INTERVAL, Metrics
 
 logging.basicConfig(
     filename='db_errors.log',
@@ -10,243 +30,2051 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s %(message)s'
 )
 
-class Database:
-    def __init__(self):
+slow_log = logging.getLogger('slow_queries')
+slow_log.propagate = False
+slow_log.setLevel(logging.INFO)
+_slow_handler = logging.FileHandler('slow_queries.log', delay=True)
+_slow_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+slow_log.addHandler(_slow_handler)
+
+DB_DEFAULTS = dict(
+    dbname='student_projects',
+    user='postgres',
+    password='9908',
+    host='localhost',
+    port=5432
+)
+
+# [database] section of this file (any psycopg2.connect() keyword), then PG* variables,
+# then DATABASE_URL override the defaults above
+DB_CONFIG_FILE = os.environ.get('DB_CONFIG', 'database.ini')
+DB_ENV_VARS = {'PGDATABASE': 'dbname', 'PGUSER': 'user', 'PGPASSWORD': 'password',
+               'PGHOST': 'host', 'PGPORT': 'port'}
+
+# a query running longer than this is cancelled by the server; bulk loads, scripts and
+# index builds lift the limit for themselves
+STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 120_000))
+CONNECT_OPTIONS = dict(
+    connect_timeout=int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+    keepalives=1,
+    keepalives_idle=30,
+    keepalives_interval=10,
+    keepalives_count=3,
+    options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+)
+
+# failed connects are retried after RECONNECT_DELAY seconds, doubling up to RECONNECT_MAX_DELAY;
+# a read that lost its connection is re-run up to READ_RETRIES times
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+READ_RETRIES = 3
+
+ITERSIZE = 2000
+POOL_TIMEOUT = 30.0
+CACHE_SIZE = 256
+CACHE_TTL = 60.0
+SLOW_QUERIES_KEPT = 100
+
+# failing replicas are skipped for REPLICA_RETRY seconds; reads go to the primary while a
+# replica lags more than REPLICA_MAX_LAG seconds, and after a commit a thread's reads stay on
+# the primary until a lag check shows the replica has replayed up to that commit
+REPLICA_MAX_LAG = 5.0
+REPLICA_RETRY = 10.0
+REPLICA_CHECK_INTERVAL = 1.0
+REPLICA_POOL_MAX = 4
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+PLAN_CAPTURE_MODES = ('rerun', 'auto_explain', None)
+
+STUDENTS_QUERY = """
+    SELECT student_id, name, email, "group"
+    FROM public.student
+    WHERE {keyset}
+    ORDER BY student_id
+    LIMIT %s;
+"""
+
+SUPERVISORS_QUERY = """
+    SELECT supervisor_id, name, department, email
+    FROM public.supervisor
+    WHERE {keyset}
+    ORDER BY supervisor_id
+    LIMIT %s;
+"""
+
+PROJECTS_QUERY = """
+    SELECT project_id, title, start_date, status, grade,
+           supervisor_id, student_id
+    FROM public.project
+    WHERE {keyset}
+    ORDER BY project_id
+    LIMIT %s;
+"""
+
+SEARCH_1_QUERY = """
+    SELECT p.project_id, p.title, p.grade, s.name AS student_name, s."group"
+    FROM public.project p
+    JOIN public.student s ON p.student_id = s.student_id
+    WHERE p.grade BETWEEN %s AND %s
+      AND s.name ILIKE %s
+      AND {keyset}
+    ORDER BY p.grade DESC, p.project_id DESC
+    LIMIT %s;
+"""
+
+SEARCH_2_QUERY = """
+    SELECT p.project_id, p.title, p.start_date, p.status,
+           sup.name AS supervisor_name, sup.department
+    FROM public.project p
+    JOIN public.supervisor sup ON p.supervisor_id = sup.supervisor_id
+    WHERE p.start_date BETWEEN %s AND %s
+      AND sup.department ILIKE %s
+      AND {keyset}
+    ORDER BY p.start_date, p.project_id
+    LIMIT %s;
+"""
+
+SEARCH_3_QUERY = """
+    SELECT
+        st.student_id,
+        st.name AS student_name,
+        st."group",
+        COUNT(p.project_id) AS total_projects,
+        AVG(p.grade) AS avg_grade
+    FROM public.student st
+    JOIN public.project p ON p.student_id = st.student_id
+    WHERE p.status ILIKE %s
+    GROUP BY st.student_id, st.name, st."group"
+    HAVING AVG(p.grade) >= %s
+       AND {keyset}
+    ORDER BY avg_grade DESC, st.student_id DESC
+    LIMIT %s;
+"""
+
+# search 3 over the trigger-maintained student_project_stats summary
+SEARCH_3_STATS_QUERY = """
+    SELECT
+        st.student_id,
+        st.name AS student_name,
+        st."group",
+        SUM(ps.project_count)::bigint AS total_projects,
+        SUM(ps.grade_sum)::numeric / NULLIF(SUM(ps.graded_count), 0) AS avg_grade
+    FROM public.student st
+    JOIN public.student_project_stats ps ON ps.student_id = st.student_id
+    WHERE ps.status ILIKE %s
+    GROUP BY st.student_id, st.name, st."group"
+    HAVING SUM(ps.grade_sum)::numeric / NULLIF(SUM(ps.graded_count), 0) >= %s
+       AND {keyset}
+    ORDER BY avg_grade DESC, st.student_id DESC
+    LIMIT %s;
+"""
+
+SEARCH_QUERIES = {1: SEARCH_1_QUERY, 2: SEARCH_2_QUERY, 3: SEARCH_3_QUERY}
+
+# name -> (query, keyset condition, indexes of the key columns in a result row)
+PAGED_QUERIES = {
+    'get_students': (STUDENTS_QUERY, "student_id > %s", (0,)),
+    'get_supervisors': (SUPERVISORS_QUERY, "supervisor_id > %s", (0,)),
+    'get_projects': (PROJECTS_QUERY, "project_id > %s", (0,)),
+    'search_1': (SEARCH_1_QUERY, "(p.grade, p.project_id) < (%s, %s)", (2, 0)),
+    'search_2': (SEARCH_2_QUERY, "(p.start_date, p.project_id) > (%s, %s)", (2, 0)),
+    'search_3': (SEARCH_3_QUERY, "(AVG(p.grade), st.student_id) < (%s, %s)", (4, 0)),
+    'search_3_stats': (
+        SEARCH_3_STATS_QUERY,
+        "(SUM(ps.grade_sum)::numeric / NULLIF(SUM(ps.graded_count), 0), st.student_id) < (%s, %s)",
+        (4, 0)
+    ),
+}
+
+# tables each read depends on; writes to them invalidate cached results
+QUERY_TABLES = {
+    'get_students': ('student',),
+    'get_supervisors': ('supervisor',),
+    'get_projects': ('project',),
+    'search_1': ('project', 'student'),
+    'search_2': ('project', 'supervisor'),
+    'search_3': ('project', 'student'),
+    'search_3_stats': ('project', 'student'),
+}
+
+STATEMENTS = {
+    'add_student': """
+        INSERT INTO public.student (name, email, "group")
+        VALUES (%s, %s, %s)
+        RETURNING student_id;
+    """,
+    'edit_student': """
+        UPDATE public.student
+        SET name=%s, email=%s, "group"=%s
+        WHERE student_id=%s;
+    """,
+    'count_student_projects': "SELECT COUNT(*) FROM public.project WHERE student_id = %s;",
+    'delete_student': "DELETE FROM public.student WHERE student_id = %s;",
+    'add_supervisor': """
+        INSERT INTO public.supervisor (name, department, email)
+        VALUES (%s, %s, %s)
+        RETURNING supervisor_id;
+    """,
+    'edit_supervisor': """
+        UPDATE public.supervisor
+        SET name=%s, department=%s, email=%s
+        WHERE supervisor_id=%s;
+    """,
+    'count_supervisor_projects': "SELECT COUNT(*) FROM public.project WHERE supervisor_id = %s;",
+    'delete_supervisor': "DELETE FROM public.supervisor WHERE supervisor_id = %s;",
+    'add_project': """
+        INSERT INTO public.project (title, start_date, status, grade, supervisor_id, student_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING project_id;
+    """,
+    'edit_project': """
+        UPDATE public.project
+        SET title=%s, start_date=%s, status=%s, grade=%s,
+            supervisor_id=%s, student_id=%s
+        WHERE project_id=%s;
+    """,
+    'delete_project': "DELETE FROM public.project WHERE project_id = %s;",
+    # one statement each through the functions in SERVER_FUNCTIONS_INSTALL; the caller commits
+    # only when something was written
+    'delete_student_checked': "SELECT related, deleted FROM public.delete_student_checked(%s);",
+    'delete_supervisor_checked': "SELECT related, deleted FROM public.delete_supervisor_checked(%s);",
+    'add_project_checked': """
+        SELECT project_id, error FROM public.add_project_checked(%s, %s, %s, %s, %s, %s);
+    """,
+    'sync_all_sequences': "SELECT table_name, next_value FROM public.sync_all_sequences();",
+}
+# SELECTs that write; the slow-query log must not re-run them under EXPLAIN ANALYZE
+WRITING_SELECTS = frozenset(
+    {'delete_student_checked', 'delete_supervisor_checked', 'add_project_checked', 'sync_all_sequences'}
+)
+for _name, (_query, _keyset, _) in PAGED_QUERIES.items():
+    # the first page doubles as the full result when LIMIT is NULL
+    STATEMENTS[_name] = _query.format(keyset="TRUE")
+    STATEMENTS[_name + "_next"] = _query.format(keyset=_keyset)
+
+DEFAULT_SEARCH_PARAMS = {
+    'search_1': (60, 100, '%Ivan%'),
+    'search_2': (date(2025, 1, 1), date(2025, 3, 31), 'F%'),
+    'search_3': ('completed', 75),
+}
+
+# recommended index set for the three searches
+INDEXES = {
+    'idx_project_grade': "ON public.project (grade, project_id)",
+    'idx_project_start_date': "ON public.project (start_date, project_id)",
+    'idx_project_student_id': "ON public.project (student_id)",
+    'idx_project_supervisor_id': "ON public.project (supervisor_id)",
+    'idx_student_name_trgm': "ON public.student USING gin (name gin_trgm_ops)",
+    'idx_supervisor_department_trgm': "ON public.supervisor USING gin (department gin_trgm_ops)",
+    'idx_project_status_trgm': "ON public.project USING gin (status gin_trgm_ops)",
+}
+
+GENERATE_CHUNK = 50_000
+GENERATE_START_DATE = date(2025, 1, 1)
+GENERATE_DATE_SPAN = 180  # days
+PROJECTS_PER_SUPERVISOR = 50
+MIN_PROJECTS_PER_STUDENT = 1
+MAX_PROJECTS_PER_STUDENT = 5
+
+STUDENT_NAMES = ['Ivan Lapin', 'Taras Shevchenko',
+                 'Anastasiia Pshonna', 'Mykhailo Kobzar',
+                 'Maryna Starovoit']
+STUDENT_GROUPS = ['КВ-31', 'КВ-32', 'КВ-33', 'КВ-34', 'КВ-35']
+
+SUPERVISOR_NAMES = [
+    'Ivan Ivanov',
+    'Petro Petrenko',
+    'Oleg Sydorenko',
+    'Anna Bondar',
+    'Olena Kovalenko'
+]
+
+DEPARTMENTS = ['FIOT', 'FPM', 'FMM', 'FEAM', 'FSP']
+
+# per student and status: project count, grade sum and graded count, kept current by
+# statement-level triggers on project so search 3 does not aggregate the whole table
+STUDENT_STATS_INSTALL = [
+    """
+    CREATE TABLE IF NOT EXISTS public.student_project_stats (
+        student_id integer NOT NULL,
+        status text NOT NULL,
+        project_count bigint NOT NULL,
+        grade_sum bigint NOT NULL,
+        graded_count bigint NOT NULL,
+        PRIMARY KEY (student_id, status)
+    );
+    """,
+    """
+    CREATE OR REPLACE FUNCTION public.student_project_stats_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO public.student_project_stats AS s
+                (student_id, status, project_count, grade_sum, graded_count)
+            SELECT student_id, status, -COUNT(*), -COALESCE(SUM(grade), 0), -COUNT(grade)
+            FROM old_rows
+            GROUP BY student_id, status
+            ON CONFLICT (student_id, status) DO UPDATE
+            SET project_count = s.project_count + EXCLUDED.project_count,
+                grade_sum = s.grade_sum + EXCLUDED.grade_sum,
+                graded_count = s.graded_count + EXCLUDED.graded_count;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO public.student_project_stats AS s
+                (student_id, status, project_count, grade_sum, graded_count)
+            SELECT student_id, status, COUNT(*), COALESCE(SUM(grade), 0), COUNT(grade)
+            FROM new_rows
+            GROUP BY student_id, status
+            ON CONFLICT (student_id, status) DO UPDATE
+            SET project_count = s.project_count + EXCLUDED.project_count,
+                grade_sum = s.grade_sum + EXCLUDED.grade_sum,
+                graded_count = s.graded_count + EXCLUDED.graded_count;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            DELETE FROM public.student_project_stats s
+            USING (SELECT DISTINCT student_id, status FROM old_rows) o
+            WHERE s.student_id = o.student_id
+              AND s.status = o.status
+              AND s.project_count = 0;
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION public.student_project_stats_truncate() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        TRUNCATE public.student_project_stats;
+        RETURN NULL;
+    END;
+    $$;
+    """,
+    "DROP TRIGGER IF EXISTS student_project_stats_ins ON public.project;",
+    "DROP TRIGGER IF EXISTS student_project_stats_upd ON public.project;",
+    "DROP TRIGGER IF EXISTS student_project_stats_del ON public.project;",
+    "DROP TRIGGER IF EXISTS student_project_stats_trunc ON public.project;",
+    """
+    CREATE TRIGGER student_project_stats_ins AFTER INSERT ON public.project
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.student_project_stats_apply();
+    """,
+    """
+    CREATE TRIGGER student_project_stats_upd AFTER UPDATE ON public.project
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.student_project_stats_apply();
+    """,
+    """
+    CREATE TRIGGER student_project_stats_del AFTER DELETE ON public.project
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.student_project_stats_apply();
+    """,
+    """
+    CREATE TRIGGER student_project_stats_trunc AFTER TRUNCATE ON public.project
+    FOR EACH STATEMENT EXECUTE FUNCTION public.student_project_stats_truncate();
+    """,
+]
+
+STUDENT_STATS_REBUILD = [
+    "LOCK TABLE public.project IN SHARE MODE;",
+    "TRUNCATE public.student_project_stats;",
+    """
+    INSERT INTO public.student_project_stats
+        (student_id, status, project_count, grade_sum, graded_count)
+    SELECT student_id, status, COUNT(*), COALESCE(SUM(grade), 0), COUNT(grade)
+    FROM public.project
+    GROUP BY student_id, status;
+    """,
+]
+
+STUDENT_STATS_DROP = [
+    "DROP TRIGGER IF EXISTS student_project_stats_ins ON public.project;",
+    "DROP TRIGGER IF EXISTS student_project_stats_upd ON public.project;",
+    "DROP TRIGGER IF EXISTS student_project_stats_del ON public.project;",
+    "DROP TRIGGER IF EXISTS student_project_stats_trunc ON public.project;",
+    "DROP FUNCTION IF EXISTS public.student_project_stats_apply();",
+    "DROP FUNCTION IF EXISTS public.student_project_stats_truncate();",
+    "DROP TABLE IF EXISTS public.student_project_stats;",
+]
+
+STUDENT_STATS_CHECK = """
+    WITH live AS (
+        SELECT student_id, status::text AS status, COUNT(*) AS project_count,
+               COALESCE(SUM(grade), 0) AS grade_sum, COUNT(grade) AS graded_count
+        FROM public.project
+        GROUP BY student_id, status
+    )
+    SELECT COALESCE(l.student_id, s.student_id) AS student_id,
+           COALESCE(l.status, s.status) AS status,
+           l.project_count, s.project_count,
+           l.grade_sum, s.grade_sum,
+           l.graded_count, s.graded_count
+    FROM live l
+    FULL JOIN public.student_project_stats s
+      ON s.student_id = l.student_id AND s.status = l.status
+    WHERE (l.project_count, l.grade_sum, l.graded_count)
+          IS DISTINCT FROM (s.project_count, s.grade_sum, s.graded_count)
+    ORDER BY 1, 2;
+"""
+
+# server-side versions of operations that otherwise take several round trips
+SERVER_FUNCTIONS_INSTALL = [
+    f"""
+    CREATE OR REPLACE FUNCTION public.delete_{_table}_checked(p_id integer, OUT related bigint, OUT deleted boolean)
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- counted before anything is locked or written, so a row with projects returns with
+        -- nothing to commit; a project added after the count makes the DELETE fail on the
+        -- foreign key, as in the client-side path
+        deleted := false;
+        SELECT COUNT(*) INTO related FROM public.project WHERE {_table}_id = p_id;
+        IF related > 0 THEN
+            RETURN;
+        END IF;
+        DELETE FROM public.{_table} WHERE {_table}_id = p_id;
+        deleted := FOUND;
+    END;
+    $$;
+    """
+    for _table in ('student', 'supervisor')
+] + [
+    """
+    CREATE OR REPLACE FUNCTION public.sync_all_sequences()
+    RETURNS TABLE (table_name text, next_value bigint) LANGUAGE plpgsql AS $$
+    DECLARE
+        t record;
+        seq text;
+    BEGIN
+        FOR t IN SELECT * FROM (VALUES ('student', 'student_id'), ('supervisor', 'supervisor_id'),
+                                       ('project', 'project_id')) v (tbl, pk) LOOP
+            seq := pg_get_serial_sequence('public.' || t.tbl, t.pk);
+            CONTINUE WHEN seq IS NULL;
+            EXECUTE format('SELECT COALESCE(MAX(%I), 0) + 1 FROM public.%I', t.pk, t.tbl) INTO next_value;
+            PERFORM setval(seq, next_value, false);
+            table_name := t.tbl;
+            RETURN NEXT;
+        END LOOP;
+    END;
+    $$;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION public.add_project_checked(
+        p_title text, p_start_date date, p_status text, p_grade integer,
+        p_supervisor_id integer, p_student_id integer,
+        OUT project_id integer, OUT error text)
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- plain reads, so a missing row returns with no locks held and nothing to commit; a row
+        -- deleted after the check makes the INSERT fail on the foreign key instead
+        PERFORM 1 FROM public.supervisor WHERE supervisor_id = p_supervisor_id;
+        IF NOT FOUND THEN
+            error := format('supervisor %s does not exist', p_supervisor_id);
+            RETURN;
+        END IF;
+        PERFORM 1 FROM public.student WHERE student_id = p_student_id;
+        IF NOT FOUND THEN
+            error := format('student %s does not exist', p_student_id);
+            RETURN;
+        END IF;
+        INSERT INTO public.project (title, start_date, status, grade, supervisor_id, student_id)
+        VALUES (p_title, p_start_date, p_status, p_grade, p_supervisor_id, p_student_id)
+        RETURNING project.project_id INTO project_id;
+    END;
+    $$;
+    """,
+]
+SERVER_FUNCTIONS_DROP = [
+    "DROP FUNCTION IF EXISTS public.delete_student_checked(integer);",
+    "DROP FUNCTION IF EXISTS public.delete_supervisor_checked(integer);",
+    "DROP FUNCTION IF EXISTS public.sync_all_sequences();",
+    "DROP FUNCTION IF EXISTS public.add_project_checked(text, date, text, integer, integer, integer);",
+]
+
+# (transaction id, table, row id) for every changed row, written by statement-level triggers so
+# readers such as the snapshot engine can catch up without reloading whole tables;
+# a NULL row id means the table was truncated
+CHANGE_LOG_TABLES = {'student': 'student_id', 'supervisor': 'supervisor_id', 'project': 'project_id'}
+CHANGE_LOG_RETENTION = 3600.0
+
+CHANGE_LOG_INSTALL = [
+    """
+    CREATE TABLE IF NOT EXISTS public.change_log (
+        change_id bigserial PRIMARY KEY,
+        txid bigint NOT NULL DEFAULT txid_current(),
+        changed_at timestamptz NOT NULL DEFAULT clock_timestamp(),
+        table_name text NOT NULL,
+        row_id integer
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS change_log_txid ON public.change_log (txid);",
+    """
+    CREATE OR REPLACE FUNCTION public.change_log_record() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- TG_ARGV[0] is the primary key column of the table the trigger is on
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO public.change_log (table_name, row_id)
+            SELECT TG_TABLE_NAME, (to_jsonb(n) ->> TG_ARGV[0])::integer FROM new_rows n;
+        ELSIF TG_OP = 'UPDATE' THEN
+            INSERT INTO public.change_log (table_name, row_id)
+            SELECT TG_TABLE_NAME, (to_jsonb(o) ->> TG_ARGV[0])::integer FROM old_rows o
+            UNION
+            SELECT TG_TABLE_NAME, (to_jsonb(n) ->> TG_ARGV[0])::integer FROM new_rows n;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO public.change_log (table_name, row_id)
+            SELECT TG_TABLE_NAME, (to_jsonb(o) ->> TG_ARGV[0])::integer FROM old_rows o;
+        ELSE
+            INSERT INTO public.change_log (table_name, row_id) VALUES (TG_TABLE_NAME, NULL);
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """,
+]
+
+
+def statement_triggers(prefix, function):
+    # (install, drop) statements of one AFTER ... FOR EACH STATEMENT trigger per table and
+    # event, named <prefix>_<table>_<event>; the function gets the table's primary key column
+    install, drop = [], []
+    for table, pk in CHANGE_LOG_TABLES.items():
+        for suffix, event, referencing in (
+            ('ins', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+            ('upd', 'UPDATE', 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('del', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+            ('trunc', 'TRUNCATE', ''),
+        ):
+            drop_sql = f"DROP TRIGGER IF EXISTS {prefix}_{table}_{suffix} ON public.{table};"
+            install += [
+                drop_sql,
+                f"CREATE TRIGGER {prefix}_{table}_{suffix} AFTER {event} ON public.{table} "
+                f"{referencing} FOR EACH STATEMENT EXECUTE FUNCTION public.{function}('{pk}');",
+            ]
+            drop.append(drop_sql)
+    return install, drop
+
+
+_install, _drop = statement_triggers('change_log', 'change_log_record')
+CHANGE_LOG_INSTALL += _install
+CHANGE_LOG_DROP = _drop + [
+    "DROP FUNCTION IF EXISTS public.change_log_record();",
+    "DROP TABLE IF EXISTS public.change_log;",
+]
+
+# transactions still running at the marker have txid >= marker, so asking for txid >= previous
+# marker never misses a change that committed late (changes are re-read until they are older)
+CHANGE_LOG_SINCE = """
+    SELECT m.marker, c.table_name, c.row_id
+    FROM (SELECT txid_snapshot_xmin(txid_current_snapshot()) AS marker) m
+    LEFT JOIN (
+        SELECT DISTINCT table_name, row_id
+        FROM public.change_log
+        WHERE txid >= %s
+    ) c ON TRUE;
+"""
+
+# NOTIFY on every committed change: {"table": ..., "op": INSERT/UPDATE/DELETE/TRUNCATE, "ids": [...]}.
+# Payloads are capped at 8000 bytes, so ids go out CHANGE_FEED_BATCH at a time; past
+# CHANGE_FEED_MAX_IDS, and on TRUNCATE, "ids" is null and listeners reload the table
+CHANGE_FEED_CHANNEL = 'table_changes'
+CHANGE_FEED_BATCH = 500
+CHANGE_FEED_MAX_IDS = 5000
+CHANGE_FEED_OPS = ('INSERT', 'UPDATE', 'DELETE', 'TRUNCATE')
+CHANGE_FEED_RESYNC = 'RESYNC'  # sent by the listener itself after a reconnect
+
+CHANGE_FEED_INSTALL = [
+    f"""
+    CREATE OR REPLACE FUNCTION public.change_feed_notify() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        ids integer[];
+        i integer;
+    BEGIN
+        -- TG_ARGV[0] is the primary key column of the table the trigger is on
+        IF TG_OP = 'INSERT' THEN
+            SELECT array_agg((to_jsonb(n) ->> TG_ARGV[0])::integer) INTO ids FROM new_rows n;
+        ELSIF TG_OP = 'UPDATE' THEN
+            SELECT array_agg(DISTINCT id) INTO ids FROM (
+                SELECT (to_jsonb(o) ->> TG_ARGV[0])::integer AS id FROM old_rows o
+                UNION ALL
+                SELECT (to_jsonb(n) ->> TG_ARGV[0])::integer FROM new_rows n
+            ) u;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT array_agg((to_jsonb(o) ->> TG_ARGV[0])::integer) INTO ids FROM old_rows o;
+        END IF;
+
+        IF TG_OP <> 'TRUNCATE' AND ids IS NULL THEN
+            RETURN NULL;  -- the statement changed no rows
+        END IF;
+        IF ids IS NULL OR cardinality(ids) > {CHANGE_FEED_MAX_IDS} THEN
+            PERFORM pg_notify('{CHANGE_FEED_CHANNEL}',
+                json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'ids', NULL)::text);
+            RETURN NULL;
+        END IF;
+        FOR i IN 1 .. cardinality(ids) BY {CHANGE_FEED_BATCH} LOOP
+            PERFORM pg_notify('{CHANGE_FEED_CHANNEL}',
+                json_build_object('table', TG_TABLE_NAME, 'op', TG_OP,
+                                  'ids', ids[i:i + {CHANGE_FEED_BATCH - 1}])::text);
+        END LOOP;
+        RETURN NULL;
+    END;
+    $$;
+    """,
+]
+_install, _drop = statement_triggers('change_feed', 'change_feed_notify')
+CHANGE_FEED_INSTALL += _install
+CHANGE_FEED_DROP = _drop + ["DROP FUNCTION IF EXISTS public.change_feed_notify();"]
+
+PLAN_CACHE_MODES = ('auto', 'force_custom_plan', 'force_generic_plan')
+
+# range partitioning of project by start_date: interval name -> (date_trunc unit, step)
+PARTITION_INTERVALS = {
+    'week': ('week', '1 week'),
+    'month': ('month', '1 month'),
+    'quarter': ('quarter', '3 months'),
+    'year': ('year', '1 year'),
+}
+
+# creates the partitions covering first_day..last_day; rows already parked in
+# project_default for a new range are moved into it before it is attached
+PARTITION_FUNCTION = """
+    CREATE OR REPLACE FUNCTION public.project_ensure_partitions(first_day date, last_day date)
+    RETURNS integer LANGUAGE plpgsql AS $$
+    DECLARE
+        lower_bound date := date_trunc('{unit}', first_day)::date;
+        upper_bound date;
+        part text;
+        created integer := 0;
+    BEGIN
+        WHILE lower_bound <= last_day LOOP
+            upper_bound := (lower_bound + interval '{step}')::date;
+            part := 'project_p' || to_char(lower_bound, 'YYYYMMDD');
+            IF to_regclass('public.' || part) IS NULL THEN
+                -- concurrent callers create each partition once
+                PERFORM pg_advisory_xact_lock(hashtext('public.project_ensure_partitions'));
+                IF to_regclass('public.' || part) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE public.%I (LIKE public.project INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                        part);
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM public.project_default '
+                        'WHERE start_date >= %L AND start_date < %L RETURNING *) '
+                        'INSERT INTO public.%I SELECT * FROM moved',
+                        lower_bound, upper_bound, part);
+                    EXECUTE format(
+                        'ALTER TABLE public.project ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                        part, lower_bound, upper_bound);
+                    created := created + 1;
+                END IF;
+            END IF;
+            lower_bound := upper_bound;
+        END LOOP;
+        RETURN created;
+    END;
+    $$;
+"""
+
+# run in one transaction; indexes, sequence position and the trigger-based extras are
+# restored afterwards by partition_projects()
+PARTITION_MIGRATION = [
+    "LOCK TABLE public.project IN ACCESS EXCLUSIVE MODE;",
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.project'::regclass) THEN
+            RAISE EXCEPTION 'public.project is already partitioned';
+        END IF;
+        -- the primary key becomes (project_id, start_date), which a foreign key cannot reference
+        IF EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE confrelid = 'public.project'::regclass AND contype = 'f') THEN
+            RAISE EXCEPTION 'public.project is referenced by a foreign key';
+        END IF;
+    END;
+    $$;
+    """,
+    "ALTER TABLE public.project RENAME TO project_unpartitioned;",
+    """
+    CREATE TABLE public.project
+        (LIKE public.project_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY RANGE (start_date);
+    """,
+    "ALTER TABLE public.project ALTER COLUMN start_date SET NOT NULL;",
+    """
+    DO $$
+    DECLARE
+        fk record;
+        seq text := pg_get_serial_sequence('public.project_unpartitioned', 'project_id');
+    BEGIN
+        FOR fk IN SELECT conname, pg_get_constraintdef(oid) AS definition
+                  FROM pg_constraint
+                  WHERE conrelid = 'public.project_unpartitioned'::regclass AND contype = 'f'
+        LOOP
+            EXECUTE format('ALTER TABLE public.project ADD CONSTRAINT %I %s', fk.conname, fk.definition);
+        END LOOP;
+        -- keeps the sequence alive after the old table is dropped and visible to sync_sequences
+        IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY public.project.project_id', seq);
+        END IF;
+    END;
+    $$;
+    """,
+    "CREATE TABLE public.project_default PARTITION OF public.project DEFAULT;",
+]
+# a unique index on a partitioned table must include the partition key, so after this
+# project_id alone is no longer enforced unique: new rows take ids from the sequence and
+# import_table() checks for duplicates, but an explicit-id INSERT can repeat an id
+PARTITION_MIGRATION_FINISH = [
+    # one call per distinct date: a range over MIN..MAX would create every empty partition between
+    """
+    SELECT public.project_ensure_partitions(start_date, start_date)
+    FROM (SELECT DISTINCT start_date FROM public.project_unpartitioned) dates;
+    """,
+    "INSERT INTO public.project SELECT * FROM public.project_unpartitioned;",
+    "DROP TABLE public.project_unpartitioned;",
+    "ALTER TABLE public.project ADD PRIMARY KEY (project_id, start_date);",
+]
+
+# run before an import into the partitioned project commits; the primary key no longer catches this
+PROJECT_DUPLICATE_CHECK = """
+    DO $$
+    DECLARE
+        duplicate integer;
+    BEGIN
+        SELECT project_id INTO duplicate FROM public.project
+        GROUP BY project_id HAVING count(*) > 1 LIMIT 1;
+        IF FOUND THEN
+            RAISE EXCEPTION 'duplicate key value: project_id % already exists', duplicate
+                USING ERRCODE = 'unique_violation';
+        END IF;
+    END;
+    $$;
+"""
+
+PARTITIONS_QUERY = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'public.project'::regclass
+    ORDER BY c.relname;
+"""
+PARTITION_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+ISOLATION_LEVELS = {
+    'read committed': 'READ COMMITTED',
+    'repeatable read': 'REPEATABLE READ',
+    'serializable': 'SERIALIZABLE',
+}
+TX_RETRIES = 3
+TX_BACKOFF = 0.05
+SAVEPOINT_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+TABLE_COLUMNS = {
+    'student': ('student_id', 'name', 'email', '"group"'),
+    'supervisor': ('supervisor_id', 'name', 'department', 'email'),
+    'project': ('project_id', 'title', 'start_date', 'status', 'grade', 'supervisor_id', 'student_id'),
+}
+
+# student -> supervisor -> project keeps project foreign keys satisfied during import
+IMPORT_ORDER = ('student', 'supervisor', 'project')
+
+COPY_FORMATS = {
+    'csv': 'FORMAT csv, HEADER true',
+    'binary': 'FORMAT binary',
+}
+COPY_BUFFER = 1 << 16
+BATCH_SIZE = 1000
+
+@functools.lru_cache(maxsize=512)
+def is_read_query(query):
+    return query.lstrip().split()[0].upper() in ("SELECT", "WITH")
+
+
+@functools.lru_cache(maxsize=512)
+def is_explainable(query):
+    return query.lstrip().split()[0].upper() in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "EXECUTE")
+
+
+def to_positional(query):
+    # psycopg2 %s placeholders -> $1..$n for PREPARE
+    counter = itertools.count(1)
+    return re.sub(r"%s", lambda _: f"${next(counter)}", query.strip().rstrip(";"))
+
+
+def chunk_seed(seed, index):
+    # setseed() wants a value in [-1, 1]; one per chunk keeps parallel runs reproducible
+    return random.Random(seed * 1_000_003 + index).uniform(-1, 1)
+
+
+def error_kind(exc):
+    if isinstance(exc, errors.ForeignKeyViolation):
+        return 'ForeignKeyViolation'
+    if isinstance(exc, errors.UniqueViolation):
+        return 'UniqueViolation'
+    return 'other'
+
+
+def report_error(exc):
+    if isinstance(exc, errors.ForeignKeyViolation):
+        logging.error("ForeignKeyViolation:\n" + traceback.format_exc())
+        print("Error: foreign key violation (related record exists / is missing).")
+        return 'ForeignKeyViolation'
+    if isinstance(exc, errors.UniqueViolation):
+        logging.error("UniqueViolation:\n" + traceback.format_exc())
+        print("Error: uniqueness violation (duplicate key).")
+        return 'UniqueViolation'
+    logging.error("SQL execution error:\n" + traceback.format_exc())
+    print("SQL execution error: operation not performed (details in db_errors.log).")
+    return 'other'
+
+
+def load_db_params(config_file=DB_CONFIG_FILE, environ=os.environ):
+    if environ.get('DATABASE_URL'):
+        return {'dsn': environ['DATABASE_URL']}
+    params = dict(DB_DEFAULTS)
+    parser = configparser.ConfigParser()
+    if parser.read(config_file, encoding='utf-8') and parser.has_section('database'):
+        params.update(parser['database'])
+    params.update({key: environ[var] for var, key in DB_ENV_VARS.items() if environ.get(var)})
+    return params
+
+
+DB_PARAMS = load_db_params()
+
+
+def connection_params(target):
+    # a DSN string or a dict of psycopg2.connect() keyword arguments, plus keepalive and
+    # timeout settings unless the target sets its own. A DSN is split into keywords first:
+    # connect() lets keyword arguments override the DSN, which would drop its own options
+    params = {'dsn': target} if isinstance(target, str) else dict(target)
+    dsn = params.pop('dsn', None)
+    if dsn:
         try:
-            self.conn = psycopg2.connect(
-                dbname='student_projects',
-                user='postgres',
-                password='9908',
-                host='localhost',
-                port=5432
-        )
-            self.cur = self.conn.cursor()
-            print("Connected to PostgreSQL successfully!")
-        except Exception:
-            logging.error("Error connecting to PostgreSQL:\n" + traceback.format_exc())
-            print("Error: Failed to connect to database (details in db_errors.log).")
+            params = {**extensions.parse_dsn(dsn), **params}
+        except psycopg2.ProgrammingError:
+            # left for connect() to report like any other connection failure
+            params['dsn'] = dsn
+    return {**CONNECT_OPTIONS, **params}
+
+
+def is_disconnect(conn, exc):
+    # psycopg2 marks the connection closed once the server or network has gone away
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError)) and bool(conn.closed)
+
+
+def is_replica_failure(exc):
+    # the replica or the way to it failed; a cancelled or invalid statement would fail on the
+    # primary too
+    return (isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout))
+            and not isinstance(exc, errors.QueryCanceled))
+
+
+class ReplicaBehind(Exception):
+    # the replica is healthy but has not replayed this thread's last commit yet
+    pass
+
+
+class ChangeFeed:
+    # notifications only reach the session that ran LISTEN, so the feed has its own autocommit
+    # connection instead of a pooled one
+    def __init__(self, conn_params, tables=None):
+        self.conn_params = conn_params
+        self.tables = set(tables or CHANGE_LOG_TABLES)
+        self.conn = None
+        self.received = 0
+        self.polled = False
+        self._connect_delay = 0.0
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.conn_params)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANGE_FEED_CHANNEL};")
+        self.conn = conn
+
+    def _reconnect(self, timeout, resync):
+        # changes made while the feed was down were never delivered, so listeners get a
+        # RESYNC event per table and reload it
+        try:
+            self._connect()
+        except psycopg2.OperationalError:
+            logging.error("Error connecting change feed:\n" + traceback.format_exc())
+            self._connect_delay = min(self._connect_delay * 2, RECONNECT_MAX_DELAY) or RECONNECT_DELAY
+            time.sleep(self._connect_delay if timeout is None else min(self._connect_delay, timeout))
+            return None
+        self._connect_delay = 0.0
+        if not resync:
+            return []
+        return [{'table': table, 'op': CHANGE_FEED_RESYNC, 'ids': None} for table in sorted(self.tables)]
+
+    def poll(self, timeout=0.0):
+        # events delivered within timeout seconds (None waits for the first one)
+        events = []
+        # the first poll comes before the caller loads its copy (listen_changes()); after it a
+        # caller may hold data, so any later connect, even the first to succeed, needs a RESYNC
+        first_poll = not self.polled
+        self.polled = True
+        if self.conn is None or self.conn.closed:
+            events = self._reconnect(timeout, resync=not first_poll)
+            if events is None:
+                return []
+        conn = self.conn
+        try:
+            if not conn.notifies and not events:
+                if select.select([conn], [], [], timeout) == ([], [], []):
+                    return []
+            conn.poll()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError, OSError):
+            logging.error("Change feed connection lost:\n" + traceback.format_exc())
+            conn.close()
+            return events
+
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                event = json.loads(notify.payload)
+            except ValueError:
+                logging.error(f"Malformed change feed payload: {notify.payload!r}")
+                continue
+            if event.get('table') in self.tables:
+                events.append(event)
+        self.received += len(events)
+        return events
+
+    def events(self, idle_timeout=None):
+        # yields events as they arrive; stops after idle_timeout seconds without one. poll()
+        # also returns nothing for unwatched tables or a failed reconnect, so the idle time
+        # is measured, not taken from a single empty poll
+        last_event = time.monotonic()
+        while True:
+            remaining = None
+            if idle_timeout is not None:
+                remaining = idle_timeout - (time.monotonic() - last_event)
+                if remaining <= 0:
+                    return
+            events = self.poll(remaining)
+            if events:
+                last_event = time.monotonic()
+                yield from events
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def writes(*tables):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._tables_changed(tables)
+        return wrapper
+    return decorator
+
+
+class Database:
+    def __init__(self, itersize=ITERSIZE, pool_min=1, pool_max=None, pool_timeout=POOL_TIMEOUT,
+                 cache_size=None, cache_ttl=CACHE_TTL, cache_ttls=None,
+                 slow_query_ms=None, plan_capture='rerun', primary=None, replicas=None,
+                 max_replica_lag=REPLICA_MAX_LAG):
+        self.itersize = itersize
+        self.slow_query_ms = None
+        self.plan_capture = None
+        self._slow_queries = []  # min-heap of the slowest queries this session
+        self._slow_lock = threading.Lock()
+        if slow_query_ms is not None:
+            self.enable_slow_query_log(slow_query_ms, plan_capture)
+        self.metrics = None
+        self.cache = None
+        if cache_size:
+            self.enable_cache(cache_size, cache_ttl, cache_ttls)
+        self._stream_ids = itertools.count(1)
+        self._savepoint_ids = itertools.count(1)
+        self._local = threading.local()
+        self._prepared = weakref.WeakKeyDictionary()
+        self._prepared_lock = threading.Lock()
+        self._columns = {}  # statement name -> result column names, for cache hits
+        self.plan_cache_mode = 'auto'
+        self.student_stats = None  # unknown until first search 3
+        self.server_functions = None  # unknown until the first call that can use them
+        self.project_partitioned = None  # unknown until the first project write
+        self._partitioned_dates = set()
+        self.primary_params = connection_params(primary or DB_PARAMS)
+        self.max_replica_lag = max_replica_lag
+        # replicas connect lazily, so one that is down does not block startup
+        self.replicas = [
+            {'name': f"replica {i}", 'down_until': 0.0, 'checked_at': 0.0, 'lag': None, 'reads': 0,
+             'failures': 0, 'pool': ConnectionPool(0, pool_max or REPLICA_POOL_MAX, timeout=pool_timeout,
+                                                   **connection_params(target))}
+            for i, target in enumerate(replicas or (), 1)
+        ]
+        self._replica_ids = itertools.count()
+        # the primary connects on first use, so the menu starts without waiting for the server
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_timeout = pool_timeout
+        self.conn = None
+        self.pool = None
+        self._connect_lock = threading.Lock()
+        self._connect_delay = 0.0
+        self._next_connect_at = 0.0
+        self._connected_once = False
+
+    def _connect(self):
+        # opens the pool or the single connection; after a failure further attempts wait
+        # RECONNECT_DELAY seconds, doubling each time
+        with self._connect_lock:
+            if (self.pool if self.pool_max else self.conn) is not None:
+                return True
+            if time.monotonic() < self._next_connect_at:
+                return False
+            try:
+                if self.pool_max:
+                    self.pool = ConnectionPool(self.pool_min, self.pool_max, timeout=self.pool_timeout,
+                                               **self.primary_params)
+                    message = f"(pool of {self.pool_min}..{self.pool_max} connections)"
+                else:
+                    self.conn = psycopg2.connect(**self.primary_params)
+                    message = ""
+            except Exception:
+                logging.error("Error connecting to PostgreSQL:\n" + traceback.format_exc())
+                print("Error: Failed to connect to database (details in db_errors.log).")
+                self._connect_failed()
+                return False
+            self._connect_delay = 0.0
+            self._next_connect_at = 0.0
+            verb = "Reconnected" if self._connected_once else "Connected"
+            self._connected_once = True
+            print(f"{verb} to PostgreSQL successfully! {message}".rstrip())
+            return True
+
+    def _connect_failed(self):
+        self._connect_delay = min(self._connect_delay * 2, RECONNECT_MAX_DELAY) or RECONNECT_DELAY
+        self._next_connect_at = time.monotonic() + self._connect_delay
+
+    def _drop_connection(self, conn):
+        # a pooled connection is discarded by putconn(); the single one is reopened on next use
+        if getattr(self._local, 'read_attempt', None) is not None:
+            # _retry_read() runs the read again on a new connection
+            self._local.disconnected = True
+        if conn is self.conn:
             self.conn = None
-            self.cur = None
+            conn.close()
 
-    def execute(self, query, params=None, fetch=False, report_time=False):
-        if self.conn is None or self.cur is None:
-            print("Error: Database connection is not established.")
-            default = [] if fetch else None
-            return (default, 0.0) if report_time else default
+    def connect(self):
+        # connect now instead of on the first query; False if the server cannot be reached
+        with self.connection() as conn:
+            return conn is not None
 
-        start_time = time.monotonic() if report_time else None
+    @contextmanager
+    def connection(self):
+        # nested calls from the same thread share one checked-out connection
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        if self.conn is not None and self.conn.closed:
+            self._drop_connection(self.conn)
+        if self.pool is None and self.conn is None and not self._connect():
+            yield None
+            return
+        if self.pool is None:
+            yield self.conn
+            return
+        if time.monotonic() < self._next_connect_at:
+            # the server was unreachable a moment ago; callers report the missing connection
+            yield None
+            return
 
         try:
-            self.cur.execute(query, params or ())
+            conn = self.pool.getconn()
+        except Exception as e:
+            if isinstance(e, psycopg2.OperationalError):
+                self._connect_failed()
+            logging.error("Error checking out pooled connection:\n" + traceback.format_exc())
+            print("Error: no free database connection (details in db_errors.log).")
+            yield None
+            return
+        self._connect_delay = 0.0
 
-            rows = self.cur.fetchall() if fetch else None
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self.pool.putconn(conn)
 
-            first_word = query.lstrip().split()[0].upper()
-            if first_word not in ("SELECT", "WITH"):
-                self.conn.commit()
+    def enable_cache(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, ttls=None):
+        self.cache = QueryCache(max_entries, ttl, ttls)
 
-            duration_ms = (time.monotonic() - start_time) * 1000 if report_time else None
+    def disable_cache(self):
+        self.cache = None
 
-            if report_time:
-                return (rows, duration_ms) if fetch else (None, duration_ms)
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else None
 
-            return rows
+    def _tables_changed(self, tables):
+        if self._in_transaction():
+            # other sessions keep reading the old rows until commit
+            self._local.pending_tables.update(tables)
+            return
+        if self.cache:
+            self.cache.invalidate(tables)
 
-        except errors.ForeignKeyViolation:
-            logging.error("ForeignKeyViolation:\n" + traceback.format_exc())
-            print("Error: foreign key violation (related record exists / is missing).")
-            self.conn.rollback()
-        except errors.UniqueViolation:
-            logging.error("UniqueViolation:\n" + traceback.format_exc())
-            print("Error: uniqueness violation (duplicate key).")
-            self.conn.rollback()
-        except Exception:
-            logging.error("SQL execution error:\n" + traceback.format_exc())
-            print("SQL execution error: operation not performed (details in db_errors.log).")
-            self.conn.rollback()
+    def pool_stats(self):
+        return self.pool.stats() if self.pool else None
+
+    def enable_metrics(self, port=None, dump_path=None, dump_interval=DUMP_INTERVAL):
+        self.disable_metrics()
+        metrics = Metrics()
+        if port is not None:
+            try:
+                port = metrics.serve(port)
+            except OSError:
+                logging.error("Error starting metrics endpoint:\n" + traceback.format_exc())
+                print(f"Error: cannot serve metrics on port {port} (details in db_errors.log).")
+                return None
+            print(f"Metrics served at http://127.0.0.1:{port}/metrics")
+        if dump_path:
+            metrics.start_dump(dump_path, dump_interval)
+        self.metrics = metrics
+        return metrics
+
+    def disable_metrics(self):
+        if self.metrics:
+            self.metrics.close()
+            self.metrics = None
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot() if self.metrics else None
+
+    def _metric_label(self, label):
+        # the statement name, with keyset follow-up pages counted under their first page
+        if label:
+            return label[:-len("_next")] if label.endswith("_next") else label
+        return 'execute'
+
+    def execute(self, query, params=None, fetch=False, report_time=False, commit=None, label=None):
+        with self.connection() as conn:
+            if conn is None:
+                if getattr(self._local, 'disconnected', False) or getattr(self._local, 'read_attempt', None):
+                    # reconnecting after a drop failed; _retry_read() waits and tries again
+                    self._local.disconnected = True
+                else:
+                    print("Error: Database connection is not established.")
+                default = [] if fetch else None
+                # no duration: the statement never ran, so callers such as the cache keep nothing
+                return (default, None) if report_time else default
+
+            slow_query_ms = self.slow_query_ms
+            if slow_query_ms is not None and self.plan_capture == 'auto_explain':
+                self._setup_auto_explain(conn)
+            metrics = self.metrics
+            timed = report_time or slow_query_ms is not None or metrics is not None
+            start_time = time.monotonic() if timed else None
+
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(query, params or ())
+
+                    rows = cur.fetchall() if fetch else None
+                    rowcount = cur.rowcount
+                    if fetch and cur.description:
+                        columns = tuple(column[0] for column in cur.description)
+                        self._local.columns = columns
+                        if label:
+                            self._columns[label] = columns
+
+                if commit is None:
+                    commit = not is_read_query(query)
+                if commit:
+                    self._commit(conn)
+
+                duration_ms = (time.monotonic() - start_time) * 1000 if timed else None
+                if metrics is not None:
+                    metrics.observe(self._metric_label(label), duration_ms, len(rows) if fetch else rowcount)
+                if slow_query_ms is not None and duration_ms >= slow_query_ms:
+                    self._record_slow_query(conn, query, params, duration_ms, rowcount,
+                                            not commit and label not in WRITING_SELECTS)
+
+                if report_time:
+                    return (rows, duration_ms) if fetch else (None, duration_ms)
+
+                return rows
+
+            except Exception as e:
+                if metrics is not None:
+                    metrics.observe(self._metric_label(label), (time.monotonic() - start_time) * 1000,
+                                    error=error_kind(e))
+                self._report_error(conn, e)
 
         default = [] if fetch else None
         return (default, None) if report_time else default
 
+    def enable_slow_query_log(self, threshold_ms, plan_capture='rerun'):
+        if plan_capture not in PLAN_CAPTURE_MODES:
+            raise ValueError(f"Unknown plan capture mode: {plan_capture}")
+        self.plan_capture = plan_capture
+        self.slow_query_ms = threshold_ms
 
-    def add_student(self, name, email, group_name):
-        query = """
-            INSERT INTO public.student (name, email, "group")
-            VALUES (%s, %s, %s)
-            RETURNING student_id;
+    def disable_slow_query_log(self):
+        self.slow_query_ms = None
+
+    def slowest_queries(self, n=10):
+        with self._slow_lock:
+            return [entry for _, _, entry in heapq.nlargest(n, self._slow_queries)]
+
+    def _setup_auto_explain(self, conn):
+        # auto_explain writes plans of slow statements to the server log instead of re-running them
+        state = self._connection_state(conn)
+        # SET inside transaction() would be undone by its rollback; set up on the next plain call
+        if state['auto_explain'] or self._in_transaction():
+            return
+        state['auto_explain'] = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("LOAD 'auto_explain';")
+                cur.execute("SET auto_explain.log_min_duration = %s;", (int(self.slow_query_ms),))
+                cur.execute("SET auto_explain.log_analyze = on;")
+                cur.execute("SET auto_explain.log_buffers = on;")
+                cur.execute("SET auto_explain.log_format = 'json';")
+            conn.commit()
+        except Exception:
+            logging.error("Error enabling auto_explain:\n" + traceback.format_exc())
+            print("Warning: auto_explain is not available (details in db_errors.log).")
+            conn.rollback()
+
+    def _capture_plan(self, conn, query, params, analyze):
+        # the savepoint keeps a failing EXPLAIN from aborting the caller's transaction
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SAVEPOINT slow_query_plan;")
+                try:
+                    cur.execute(f"EXPLAIN ({options}) {query}", params or ())
+                    plan = cur.fetchone()[0][0]
+                    cur.execute("RELEASE SAVEPOINT slow_query_plan;")
+                    return plan
+                except Exception:
+                    cur.execute("ROLLBACK TO SAVEPOINT slow_query_plan;")
+                    raise
+        except Exception:
+            logging.error("Error capturing query plan:\n" + traceback.format_exc())
+            return None
+
+    def _record_slow_query(self, conn, query, params, duration_ms, rowcount, read_only):
+        plan = None
+        if self.plan_capture == 'rerun' and is_explainable(query):
+            # reads are re-run under EXPLAIN ANALYZE; writes only get an estimated plan
+            plan = self._capture_plan(conn, query, params, analyze=read_only)
+        entry = {
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'query': " ".join(query.split()),
+            'params': [str(p) for p in params or ()],
+            'duration_ms': duration_ms,
+            'rows': rowcount,
+            'plan': plan,
+        }
+        slow_log.info(json.dumps(entry, default=str))
+        with self._slow_lock:
+            item = (duration_ms, id(entry), entry)
+            if len(self._slow_queries) < SLOW_QUERIES_KEPT:
+                heapq.heappush(self._slow_queries, item)
+            else:
+                heapq.heappushpop(self._slow_queries, item)
+
+    def _report_error(self, conn, exc):
+        if self._in_transaction():
+            # the whole unit of work fails; transaction() rolls back and the caller decides
+            raise exc
+        if getattr(self._local, 'replica', None) is not None and is_replica_failure(exc):
+            # _routed_read() retries on the primary; the pool rolls the replica connection back
+            raise exc
+        if is_disconnect(conn, exc):
+            self._drop_connection(conn)
+            if getattr(self._local, 'read_attempt', None) is not None:
+                logging.error("Connection lost during a read, retrying:\n" + traceback.format_exc())
+                return
+            self._local.last_error = report_error(exc)
+            return
+        self._local.last_error = report_error(exc)
+        conn.rollback()
+
+    def last_columns(self):
+        # column names of the last result this thread fetched, from cursor.description
+        return getattr(self._local, 'columns', None)
+
+    def last_error(self):
+        # kind of the last error seen by this thread ('ForeignKeyViolation', 'UniqueViolation'
+        # or 'other'), cleared on read
+        kind = getattr(self._local, 'last_error', None)
+        self._local.last_error = None
+        return kind
+
+    def _connection_state(self, conn):
+        with self._prepared_lock:
+            state = self._prepared.get(conn)
+            if state is None:
+                # a reconnected or new pooled connection starts with nothing prepared
+                state = {'prepared': set(), 'failed': set(), 'plan_cache_mode': 'auto',
+                         'auto_explain': False}
+                self._prepared[conn] = state
+            return state
+
+    def _ensure_prepared(self, conn, name):
+        state = self._connection_state(conn)
+        if name in state['failed']:
+            return False
+        in_transaction = self._in_transaction()
+        try:
+            with conn.cursor() as cur:
+                # like auto_explain, the plan cache mode is only changed outside transaction()
+                if state['plan_cache_mode'] != self.plan_cache_mode and not in_transaction:
+                    cur.execute(f"SET plan_cache_mode = {self.plan_cache_mode};")
+                    # SET is transactional: committed here, so neither an error rollback nor the
+                    # pool's rollback on putconn() can quietly undo it
+                    conn.commit()
+                    state['plan_cache_mode'] = self.plan_cache_mode
+                if name not in state['prepared']:
+                    # PREPARE is not transactional, but a failing one must not abort the caller's work
+                    if in_transaction:
+                        cur.execute("SAVEPOINT prepare_statement;")
+                    try:
+                        cur.execute(f"PREPARE {name} AS {to_positional(STATEMENTS[name])};")
+                    except Exception:
+                        if in_transaction:
+                            cur.execute("ROLLBACK TO SAVEPOINT prepare_statement;")
+                        raise
+                    if in_transaction:
+                        cur.execute("RELEASE SAVEPOINT prepare_statement;")
+                    state['prepared'].add(name)
+            return True
+        except Exception:
+            logging.error(f"Error preparing statement {name}:\n" + traceback.format_exc())
+            if conn.closed:
+                # the statement is fine, the connection is gone; the plain query reports it
+                return False
+            if not in_transaction:
+                conn.rollback()
+            state['failed'].add(name)
+            return False
+
+    def execute_prepared(self, name, params=(), fetch=False, report_time=False, commit=None):
+        # commit defaults to "not a read"; SELECTs of functions that write commit themselves
+        query = STATEMENTS[name]
+        if commit is None:
+            commit = not is_read_query(query)
+        with self.connection() as conn:
+            if conn is None or not self._ensure_prepared(conn, name):
+                return self.execute(query, params, fetch=fetch, report_time=report_time, commit=commit,
+                                    label=name)
+            placeholders = ", ".join(["%s"] * len(params))
+            return self.execute(
+                f"EXECUTE {name} ({placeholders});" if params else f"EXECUTE {name};",
+                params,
+                fetch=fetch,
+                report_time=report_time,
+                commit=commit,
+                label=name
+            )
+
+    def set_plan_cache_mode(self, mode):
+        if mode not in PLAN_CACHE_MODES:
+            raise ValueError(f"Unknown plan cache mode: {mode}")
+        self.plan_cache_mode = mode
+
+    def compare_plan_modes(self, name, params, runs=5):
+        # average execution time of a prepared statement under custom vs generic plans
+        previous = self.plan_cache_mode
+        results = {}
+        try:
+            for mode in ('force_custom_plan', 'force_generic_plan'):
+                self.set_plan_cache_mode(mode)
+                timings = []
+                for _ in range(runs + 1):
+                    _, duration_ms = self.execute_prepared(name, params, fetch=True, report_time=True)
+                    if duration_ms is not None:
+                        timings.append(duration_ms)
+                timings = timings[1:]  # first run includes planning
+                results[mode] = sum(timings) / len(timings) if timings else None
+        finally:
+            self.set_plan_cache_mode(previous)
+        return results
+
+    def _in_transaction(self):
+        return getattr(self._local, 'transaction', False)
+
+    def _commit(self, conn):
+        # inside transaction() the block commits once at its end
+        if not self._in_transaction():
+            conn.commit()
+            self._committed()
+
+    def _committed(self):
+        # read-your-writes: replicas serve this thread again once they have replayed this commit
+        self._local.last_write = time.monotonic()
+
+    @contextmanager
+    def transaction(self, isolation_level=None):
+        # every call made in the block shares one connection and one commit;
+        # a nested block becomes a savepoint
+        if isolation_level is not None and isolation_level not in ISOLATION_LEVELS:
+            raise ValueError(f"Unknown isolation level: {isolation_level}")
+        if self._in_transaction():
+            if isolation_level is not None:
+                raise ValueError("Isolation level can only be set on the outermost transaction")
+            with self.savepoint():
+                yield self
+            return
+
+        with self.connection() as conn:
+            if conn is None:
+                raise psycopg2.InterfaceError("database connection is not established")
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                # reads leave an implicit transaction open; SET TRANSACTION must come first
+                conn.commit()
+
+            self._local.transaction = True
+            self._local.pending_tables = set()
+            committed = False
+            try:
+                if isolation_level is not None:
+                    with conn.cursor() as cur:
+                        cur.execute(f"SET TRANSACTION ISOLATION LEVEL {ISOLATION_LEVELS[isolation_level]};")
+                yield self
+                conn.commit()
+                committed = True
+            except BaseException:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                self._local.transaction = False
+                tables = self._local.pending_tables
+                self._local.pending_tables = set()
+                if committed:
+                    # raw execute() writes leave no pending tables but still need read-your-writes
+                    self._committed()
+                    if tables:
+                        self._tables_changed(tables)
+
+    @contextmanager
+    def savepoint(self, name=None):
+        # an error in the block undoes only the work done since the savepoint, then propagates
+        if not self._in_transaction():
+            raise RuntimeError("savepoint() can only be used inside transaction()")
+        if name is None:
+            name = f"savepoint_{next(self._savepoint_ids)}"
+        elif not SAVEPOINT_NAME.match(name):
+            raise ValueError(f"Invalid savepoint name: {name}")
+
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SAVEPOINT {name};")
+            try:
+                yield name
+            except BaseException:
+                if not conn.closed:
+                    with conn.cursor() as cur:
+                        cur.execute(f"ROLLBACK TO SAVEPOINT {name};")
+                raise
+            with conn.cursor() as cur:
+                cur.execute(f"RELEASE SAVEPOINT {name};")
+
+    def run_in_transaction(self, func, *args, isolation_level=None, retries=TX_RETRIES,
+                           backoff=TX_BACKOFF, **kwargs):
+        # func is re-run from the start when the server aborts the transaction with a
+        # serialization failure or deadlock; backoff doubles per attempt with jitter
+        if self._in_transaction():
+            with self.transaction():
+                return func(*args, **kwargs)
+
+        for attempt in range(retries + 1):
+            try:
+                with self.transaction(isolation_level):
+                    return func(*args, **kwargs)
+            except (errors.SerializationFailure, errors.DeadlockDetected) as e:
+                if attempt == retries:
+                    self._local.last_error = report_error(e)
+                    return None
+                logging.error(f"Transaction attempt {attempt + 1} aborted ({type(e).__name__}), retrying")
+                time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+            except psycopg2.Error as e:
+                self._local.last_error = report_error(e)
+                return None
+
+    def stream(self, query, params=None, itersize=None):
+        with self.connection() as conn:
+            if conn is None:
+                print("Error: Database connection is not established.")
+                return
+            try:
+                with conn.cursor(name=f"stream_{next(self._stream_ids)}") as cur:
+                    cur.itersize = itersize or self.itersize
+                    cur.execute(query, params or ())
+                    yield from cur
+            except Exception:
+                logging.error("SQL streaming error:\n" + traceback.format_exc())
+                print("SQL execution error: streaming stopped (details in db_errors.log).")
+                if self._in_transaction():
+                    raise
+                conn.rollback()
+
+    def paginate(self, name, params, page_size, report_time=False):
+        pages = self._keyset_pages(name, tuple(params), page_size)
+        if not report_time:
+            return pages
+
+        start_time = time.monotonic()
+        first_page = next(pages, None)
+        duration_ms = (time.monotonic() - start_time) * 1000
+        if first_page is None:
+            return iter(()), duration_ms
+        return itertools.chain([first_page], pages), duration_ms
+
+    def _read(self, name, statement, params, report_time=False):
+        cache = self.cache
+        # inside transaction() reads must see the block's own uncommitted writes
+        if cache is None or self._in_transaction():
+            return self._routed_read(statement, params, report_time)
+
+        start_time = time.monotonic()
+        key = (statement, params)
+        found, rows = cache.get(key)
+        if found:
+            self._local.columns = self._columns.get(statement)
+            duration_ms = (time.monotonic() - start_time) * 1000
+            return (rows, duration_ms) if report_time else rows
+
+        tables = QUERY_TABLES[name]
+        token = cache.token(tables)
+        rows, duration_ms = self._routed_read(statement, params, report_time=True)
+        # None when the statement failed or there was no connection; an empty result from a
+        # server that was down must not be served until the TTL runs out
+        if duration_ms is not None:
+            cache.put(key, tables, rows, duration_ms, token, ttl_name=name)
+        return (rows, duration_ms) if report_time else rows
+
+    @contextmanager
+    def primary(self):
+        # reads in the block go to the primary even when replicas are configured
+        self._local.primary = getattr(self._local, 'primary', 0) + 1
+        try:
+            yield self
+        finally:
+            self._local.primary -= 1
+
+    def _pick_replica(self):
+        if not self.replicas:
+            return None
+        # a pinned connection (transaction, connection() block) keeps its reads on it
+        if getattr(self._local, 'conn', None) is not None or getattr(self._local, 'primary', 0):
+            return None
+        now = time.monotonic()
+        start = next(self._replica_ids)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica['down_until'] <= now:
+                return replica
+        return None
+
+    @contextmanager
+    def _replica_connection(self, replica):
+        conn = replica['pool'].getconn()
+        try:
+            now = time.monotonic()
+            last_write = getattr(self._local, 'last_write', -math.inf)
+            # a check made before this thread's last commit cannot show that commit replayed
+            if now - replica['checked_at'] >= REPLICA_CHECK_INTERVAL or replica['checked_at'] < last_write:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICA_LAG_QUERY)
+                    replica['lag'] = float(cur.fetchone()[0])
+                replica['checked_at'] = now
+            # while WAL is being replayed the lag is measured from the last replayed commit, so
+            # the first write after an idle spell looks like a long lag; the replica is only
+            # skipped until a check shows it caught up, not marked down
+            if replica['lag'] > self.max_replica_lag:
+                raise ReplicaBehind(replica['name'])
+            # at the last check the replica had everything committed until checked_at - lag
+            if replica['checked_at'] - replica['lag'] < last_write:
+                raise ReplicaBehind(replica['name'])
+            self._local.conn = conn
+            self._local.replica = replica
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.replica = None
+            replica['pool'].putconn(conn)
+
+    def _routed_read(self, statement, params, report_time=False):
+        replica = self._pick_replica()
+        if replica is not None:
+            try:
+                with self._replica_connection(replica):
+                    result = self.execute_prepared(statement, params, fetch=True, report_time=report_time)
+                replica['reads'] += 1
+                return result
+            except ReplicaBehind:
+                pass
+            except Exception as e:
+                if not is_replica_failure(e):
+                    raise
+                logging.error(f"Read from {replica['name']} failed, using the primary:\n" + traceback.format_exc())
+                replica['failures'] += 1
+                replica['down_until'] = time.monotonic() + REPLICA_RETRY
+        return self._retry_read(
+            lambda: self.execute_prepared(statement, params, fetch=True, report_time=report_time)
+        )
+
+    def _retry_read(self, read):
+        # a read whose connection dropped is run again once the primary is back; a pinned
+        # connection (transaction, connection() block) cannot be swapped, so it fails as before.
+        # A server that was already unreachable is not waited for.
+        if getattr(self._local, 'conn', None) is not None or self._in_transaction():
+            return read()
+        try:
+            for attempt in range(READ_RETRIES + 1):
+                # the last attempt reports its error like any other statement
+                self._local.read_attempt = attempt if attempt < READ_RETRIES else None
+                self._local.disconnected = False
+                result = read()
+                if not self._local.disconnected:
+                    return result
+                time.sleep(max(self._next_connect_at - time.monotonic(), 0))
+        finally:
+            self._local.read_attempt = None
+            self._local.disconnected = False
+
+    def replica_stats(self):
+        now = time.monotonic()
+        return [
+            {
+                'name': replica['name'],
+                'available': replica['down_until'] <= now,
+                'lag_s': replica['lag'],
+                'reads': replica['reads'],
+                'failures': replica['failures'],
+                'pool': replica['pool'].stats(),
+            }
+            for replica in self.replicas
+        ]
+
+    def _keyset_pages(self, name, params, page_size):
+        key_index = PAGED_QUERIES[name][2]
+        page = self._read(name, name, (*params, page_size))
+        while page:
+            yield page
+            if len(page) < page_size:
+                return
+            last_key = tuple(page[-1][i] for i in key_index)
+            page = self._read(name, name + "_next", (*params, *last_key, page_size))
+
+    def _select(self, name, params, page_size=None, report_time=False):
+        if page_size is None:
+            return self._read(name, name, (*params, None), report_time=report_time)
+        return self.paginate(name, params, page_size, report_time)
+
+    def _batch(self, query, rows, template=None, chunk_size=BATCH_SIZE, label='batch'):
+        # each chunk is one multi-row statement; a failing chunk is retried row by row
+        # under savepoints so one bad row does not abort the whole batch
+        rows = list(rows)
+        done, failures = [], []
+        metrics = self.metrics
+        with self.connection() as conn:
+            if conn is None:
+                print("Error: Database connection is not established.")
+                return done, [(row, "no connection") for row in rows]
+            start_time = time.monotonic()
+            try:
+                with conn.cursor() as cur:
+                    for start in range(0, len(rows), chunk_size):
+                        chunk = rows[start:start + chunk_size]
+                        cur.execute("SAVEPOINT batch_chunk;")
+                        try:
+                            result = execute_values(cur, query, chunk, template,
+                                                    page_size=len(chunk), fetch=True)
+                            cur.execute("RELEASE SAVEPOINT batch_chunk;")
+                            done.extend(r[0] for r in result)
+                        except psycopg2.Error:
+                            cur.execute("ROLLBACK TO SAVEPOINT batch_chunk;")
+                            self._batch_rows(cur, query, chunk, template, done, failures)
+                self._commit(conn)
+                if metrics is not None:
+                    metrics.observe(label, (time.monotonic() - start_time) * 1000, len(done))
+            except Exception as e:
+                if metrics is not None:
+                    metrics.observe(label, (time.monotonic() - start_time) * 1000, error=error_kind(e))
+                self._report_error(conn, e)
+                return [], [(row, "batch aborted") for row in rows]
+        return done, failures
+
+    def _batch_rows(self, cur, query, rows, template, done, failures):
+        for row in rows:
+            cur.execute("SAVEPOINT batch_row;")
+            try:
+                result = execute_values(cur, query, [row], template, fetch=True)
+                cur.execute("RELEASE SAVEPOINT batch_row;")
+                done.extend(r[0] for r in result)
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT batch_row;")
+                logging.error(f"Batch row {row!r} failed:\n" + traceback.format_exc())
+                failures.append((row, f"{type(e).__name__}: {str(e).strip()}"))
+
+    def _batch_edit(self, query, rows, template, entity):
+        rows = list(rows)
+        updated, failures = self._batch(query, rows, template, label=f"edit_{entity}s")
+        found = set(updated)
+        failed = {id(row) for row, _ in failures}
+        failures += [(row, "not found") for row in rows
+                     if row[0] not in found and id(row) not in failed]
+        print(f"Updated {len(updated)} {entity}(s), {len(failures)} failed.")
+        return updated, failures
+
+    def _batch_delete_checked(self, table, pk_column, ids, entity):
+        # (deleted ids, {blocked id: related projects}, ids that do not exist)
+        ids = list(ids)
+        if not ids:
+            return [], {}, []
+        query = f"""
+            WITH related AS (
+                SELECT {pk_column} AS id, COUNT(*) AS projects
+                FROM public.project
+                WHERE {pk_column} = ANY(%s)
+                GROUP BY {pk_column}
+            ), deleted AS (
+                DELETE FROM public.{table} t
+                WHERE t.{pk_column} = ANY(%s)
+                  AND NOT EXISTS (SELECT 1 FROM related r WHERE r.id = t.{pk_column})
+                RETURNING t.{pk_column} AS id
+            )
+            SELECT id, 0 FROM deleted
+            UNION ALL
+            SELECT id, projects FROM related;
         """
-        res = self.execute(query, (name, email, group_name), fetch=True)
+        res, duration_ms = self.execute(query, (ids, ids), fetch=True, commit=True, report_time=True,
+                                        label=f"delete_{entity}s")
+        if duration_ms is None:
+            # the statement failed, so nothing is known about any id
+            return [], {}, []
+        deleted = [row[0] for row in res if row[1] == 0]
+        blocked = {row[0]: row[1] for row in res if row[1] > 0}
+        seen = set(deleted) | set(blocked)
+        missing = [row_id for row_id in dict.fromkeys(ids) if row_id not in seen]
+        print(f"Deleted {len(deleted)} {entity}(s), {len(blocked)} skipped (have related projects), "
+              f"{len(missing)} not found.")
+        return deleted, blocked, missing
+
+    @writes('student')
+    def add_student(self, name, email, group_name):
+        res = self.execute_prepared('add_student', (name, email, group_name), fetch=True)
         if res:
             new_id = res[0][0]
             print(f"Added student id={new_id}")
             return new_id
         return None
 
+    @writes('student')
     def edit_student(self, student_id, name, email, group_name):
-        query = """
-            UPDATE public.student
-            SET name=%s, email=%s, "group"=%s
-            WHERE student_id=%s;
-        """
-        self.execute(query, (name, email, group_name, student_id))
+        self.execute_prepared('edit_student', (name, email, group_name, student_id))
 
+    @writes('student')
     def delete_student(self, student_id):
-        count = self.execute(
-            "SELECT COUNT(*) FROM public.project WHERE student_id = %s;",
-            (student_id,), fetch=True
-        )
+        if self._uses_server_functions():
+            self._delete_checked('student', student_id)
+            return
+        count = self.execute_prepared('count_student_projects', (student_id,), fetch=True)
         if count and count[0][0] > 0:
             print(
                 f"Error: Unable to delete student (ID: {student_id}). "
                 f"He/She has {count[0][0]} related projects."
             )
             return
-        self.execute("DELETE FROM public.student WHERE student_id = %s;", (student_id,))
+        self.execute_prepared('delete_student', (student_id,))
 
-    def get_students(self):
-        return self.execute(
-            'SELECT student_id, name, email, "group" FROM public.student ORDER BY student_id;',
-            fetch=True
+    def get_students(self, page_size=None):
+        return self._select('get_students', (), page_size)
+
+    @writes('student')
+    def add_students(self, rows):
+        ids, failures = self._batch(
+            'INSERT INTO public.student (name, email, "group") VALUES %s RETURNING student_id;',
+            rows,
+            label='add_students'
         )
+        print(f"Added {len(ids)} students, {len(failures)} failed.")
+        return ids, failures
 
-    def add_supervisor(self, name, department, email):
+    @writes('student')
+    def edit_students(self, rows):
         query = """
-            INSERT INTO public.supervisor (name, department, email)
-            VALUES (%s, %s, %s)
-            RETURNING supervisor_id;
+            UPDATE public.student AS s
+            SET name = v.name, email = v.email, "group" = v.group_name
+            FROM (VALUES %s) AS v(student_id, name, email, group_name)
+            WHERE s.student_id = v.student_id
+            RETURNING s.student_id;
         """
-        res = self.execute(query, (name, department, email), fetch=True)
+        return self._batch_edit(query, rows, "(%s::int, %s, %s, %s)", "student")
+
+    @writes('student')
+    def delete_students(self, student_ids):
+        return self._batch_delete_checked("student", "student_id", student_ids, "student")
+
+    @writes('supervisor')
+    def add_supervisor(self, name, department, email):
+        res = self.execute_prepared('add_supervisor', (name, department, email), fetch=True)
         if res:
             new_id = res[0][0]
             print(f"Added supervisor id={new_id}")
             return new_id
         return None
 
+    @writes('supervisor')
     def edit_supervisor(self, supervisor_id, name, department, email):
-        query = """
-            UPDATE public.supervisor
-            SET name=%s, department=%s, email=%s
-            WHERE supervisor_id=%s;
-        """
-        self.execute(query, (name, department, email, supervisor_id))
+        self.execute_prepared('edit_supervisor', (name, department, email, supervisor_id))
 
+    @writes('supervisor')
     def delete_supervisor(self, supervisor_id):
-        count = self.execute(
-            "SELECT COUNT(*) FROM public.project WHERE supervisor_id = %s;",
-            (supervisor_id,), fetch=True
-        )
+        if self._uses_server_functions():
+            self._delete_checked('supervisor', supervisor_id)
+            return
+        count = self.execute_prepared('count_supervisor_projects', (supervisor_id,), fetch=True)
         if count and count[0][0] > 0:
             print(
                 f"Error: Unable to delete supervisor (ID: {supervisor_id}). "
                 f"He/She has {count[0][0]} related projects."
             )
             return
-        self.execute("DELETE FROM public.supervisor WHERE supervisor_id = %s;", (supervisor_id,))
+        self.execute_prepared('delete_supervisor', (supervisor_id,))
 
-    def get_supervisors(self):
-        return self.execute(
-            "SELECT supervisor_id, name, department, email "
-            "FROM public.supervisor ORDER BY supervisor_id;",
-            fetch=True
+    def get_supervisors(self, page_size=None):
+        return self._select('get_supervisors', (), page_size)
+
+    @writes('supervisor')
+    def add_supervisors(self, rows):
+        ids, failures = self._batch(
+            "INSERT INTO public.supervisor (name, department, email) VALUES %s RETURNING supervisor_id;",
+            rows,
+            label='add_supervisors'
         )
+        print(f"Added {len(ids)} supervisors, {len(failures)} failed.")
+        return ids, failures
 
-    def add_project(self, title, start_date, status, grade, supervisor_id, student_id):
+    @writes('supervisor')
+    def edit_supervisors(self, rows):
         query = """
-            INSERT INTO public.project (title, start_date, status, grade, supervisor_id, student_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING project_id;
+            UPDATE public.supervisor AS s
+            SET name = v.name, department = v.department, email = v.email
+            FROM (VALUES %s) AS v(supervisor_id, name, department, email)
+            WHERE s.supervisor_id = v.supervisor_id
+            RETURNING s.supervisor_id;
         """
-        res = self.execute(query, (title, start_date, status, grade, supervisor_id, student_id), fetch=True)
+        return self._batch_edit(query, rows, "(%s::int, %s, %s, %s)", "supervisor")
+
+    @writes('supervisor')
+    def delete_supervisors(self, supervisor_ids):
+        return self._batch_delete_checked("supervisor", "supervisor_id", supervisor_ids, "supervisor")
+
+    @writes('project')
+    def add_project(self, title, start_date, status, grade, supervisor_id, student_id):
+        self._ensure_partitions_for((start_date,))
+        params = (title, start_date, status, grade, supervisor_id, student_id)
+        if self._uses_server_functions():
+            with self.connection() as conn:
+                res = self.execute_prepared('add_project_checked', params, fetch=True, commit=False)
+                if res and res[0][1]:
+                    print(f"Error: project not added, {res[0][1]}.")
+                    self._local.last_error = 'ForeignKeyViolation'
+                    return None
+                if not self._commit_if(conn, res and res[0][0] is not None):
+                    return None
+        else:
+            res = self.execute_prepared('add_project', params, fetch=True)
         if res:
             new_id = res[0][0]
             print(f"Added project id={new_id}")
             return new_id
         return None
 
+    @writes('project')
     def edit_project(self, project_id, title, start_date, status, grade, supervisor_id, student_id):
-        query = """
-            UPDATE public.project
-            SET title=%s, start_date=%s, status=%s, grade=%s,
-                supervisor_id=%s, student_id=%s
-            WHERE project_id=%s;
-        """
-        self.execute(query, (title, start_date, status, grade, supervisor_id, student_id, project_id))
+        self._ensure_partitions_for((start_date,))
+        self.execute_prepared(
+            'edit_project', (title, start_date, status, grade, supervisor_id, student_id, project_id)
+        )
 
+    @writes('project')
     def delete_project(self, project_id):
-        self.execute("DELETE FROM public.project WHERE project_id = %s;", (project_id,))
+        self.execute_prepared('delete_project', (project_id,))
 
-    def get_projects(self):
-        return self.execute(
-            """SELECT project_id, title, start_date, status, grade,
-                      supervisor_id, student_id
-               FROM public.project
-               ORDER BY project_id;""",
-            fetch=True
-        )
+    def get_projects(self, page_size=None):
+        return self._select('get_projects', (), page_size)
 
-    def generate_random_data(self, count):
-        print("Clearing tables...")
-        self.execute('TRUNCATE public.project, public.supervisor, public.student '
-                     'RESTART IDENTITY CASCADE;')
+    @writes('project')
+    def add_projects(self, rows):
+        rows = list(rows)
+        self._ensure_partitions_for(row[1] for row in rows)
+        query = """
+            INSERT INTO public.project (title, start_date, status, grade, supervisor_id, student_id)
+            VALUES %s
+            RETURNING project_id;
+        """
+        ids, failures = self._batch(query, rows, "(%s, %s::date, %s, %s::int, %s::int, %s::int)",
+                                    label='add_projects')
+        print(f"Added {len(ids)} projects, {len(failures)} failed.")
+        return ids, failures
 
-        print(f"Generating {count} rows...")
+    @writes('project')
+    def edit_projects(self, rows):
+        rows = list(rows)
+        self._ensure_partitions_for(row[2] for row in rows)
+        query = """
+            UPDATE public.project AS p
+            SET title = v.title, start_date = v.start_date, status = v.status, grade = v.grade,
+                supervisor_id = v.supervisor_id, student_id = v.student_id
+            FROM (VALUES %s) AS v(project_id, title, start_date, status, grade, supervisor_id, student_id)
+            WHERE p.project_id = v.project_id
+            RETURNING p.project_id;
+        """
+        return self._batch_edit(
+            query, rows, "(%s::int, %s, %s::date, %s, %s::int, %s::int, %s::int)", "project"
+        )
 
-        student_names = ['Ivan Lapin', 'Taras Shevchenko',
-                         'Anastasiia Pshonna', 'Mykhailo Kobzar',
-                         'Maryna Starovoit']
-        student_groups = ['КВ-31', 'КВ-32', 'КВ-33', 'КВ-34', 'КВ-35']
+    @writes('project')
+    def delete_projects(self, project_ids):
+        project_ids = list(project_ids)
+        if not project_ids:
+            return []
+        res = self.execute(
+            "DELETE FROM public.project WHERE project_id = ANY(%s) RETURNING project_id;",
+            (project_ids,), fetch=True, label='delete_projects'
+        )
+        deleted = [row[0] for row in res]
+        print(f"Deleted {len(deleted)} projects.")
+        return deleted
 
-        supervisor_names = [
-            'Ivan Ivanov',
-            'Petro Petrenko',
-            'Oleg Sydorenko',
-            'Anna Bondar',
-            'Olena Kovalenko'
-        ]
+    @writes('student', 'supervisor', 'project')
+    def generate_random_data(self, count, projects_per_supervisor=PROJECTS_PER_SUPERVISOR,
+                             min_projects=MIN_PROJECTS_PER_STUDENT, max_projects=MAX_PROJECTS_PER_STUDENT,
+                             seed=None, chunk_size=GENERATE_CHUNK, workers=1, append=False):
+        # count is the number of students; each gets min..max projects and supervisors are
+        # sized so that each one leads about projects_per_supervisor projects
+        if not append:
+            print("Clearing tables...")
+            self.execute('TRUNCATE public.project, public.supervisor, public.student '
+                         'RESTART IDENTITY CASCADE;')
 
-        departments = ['FIOT', 'FPM', 'FMM', 'FEAM', 'FSP']
+        offsets = self.execute(
+            "SELECT (SELECT COALESCE(MAX(student_id), 0) FROM public.student), "
+            "(SELECT COALESCE(MAX(supervisor_id), 0) FROM public.supervisor);",
+            fetch=True
+        )
+        if not offsets:
+            return False
+        student_offset, supervisor_offset = offsets[0]
+        if append:
+            self.sync_sequences('public.project', 'project_id')
 
-        statuses = ['active', 'completed']
+        self.ensure_project_partitions(GENERATE_START_DATE,
+                                       GENERATE_START_DATE + timedelta(days=GENERATE_DATE_SPAN))
+        expected_projects = count * (min_projects + max_projects) / 2
+        supervisor_count = max(1, math.ceil(expected_projects / projects_per_supervisor))
+        print(f"Generating {count} students, {supervisor_count} supervisors "
+              f"and ~{int(expected_projects)} projects...")
 
-        student_query = """
-            INSERT INTO public.student (name, email, "group")
+        supervisor_query = """
+            INSERT INTO public.supervisor (supervisor_id, name, department, email)
             SELECT
+                %s + gs,
                 name,
-                lower(replace(name, ' ', '.')) || '@lll.kpi.ua' AS email,
-                (ARRAY[%s, %s, %s, %s, %s])[ceil(random()*5)::int]  -- group
+                department,
+                lower(replace(name, ' ', '.')) || gs::text || '@lll.kpi.ua' AS email
             FROM (
                 SELECT
-                    (ARRAY[%s, %s, %s, %s, %s])[ceil(random()*5)::int] AS name
+                    gs,
+                    (%s::text[])[1 + floor(random() * %s)::int] AS name,
+                    (%s::text[])[1 + floor(random() * %s)::int] AS department
                 FROM generate_series(1, %s) AS gs
             ) t;
         """
-        self.execute(
-            student_query,
-            (*student_groups, *student_names, count)
-        )
+        with self.connection():
+            # pinned to one connection so setseed() applies to the insert
+            if seed is not None:
+                self.execute("SELECT setseed(%s);", (chunk_seed(seed, -1),))
+            self.execute(
+                supervisor_query,
+                (supervisor_offset, SUPERVISOR_NAMES, len(SUPERVISOR_NAMES),
+                 DEPARTMENTS, len(DEPARTMENTS), supervisor_count)
+            )
 
-        supervisor_query = """
-            INSERT INTO public.supervisor (name, department, email)
+        tasks = [
+            (lo, min(lo + chunk_size - 1, count), student_offset, supervisor_offset,
+             supervisor_count, min_projects, max_projects,
+             None if seed is None else chunk_seed(seed, i))
+            for i, lo in enumerate(range(1, count + 1, chunk_size))
+        ]
+
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer=_init_generate_worker,
+                                      initargs=(self.primary_params,)) as pool:
+                failed = self._generate_progress(pool.imap_unordered(_generate_chunk_worker, tasks), count)
+        else:
+            failed = self._generate_progress((self._generate_chunk(*task) for task in tasks), count)
+
+        self.sync_all_sequences()
+        self.execute("ANALYZE public.student, public.supervisor, public.project;")
+
+        if failed:
+            print(f"Data generation finished with {failed} of {len(tasks)} chunks failed "
+                  f"(details in db_errors.log).")
+            return False
+        print("Data generation completed successfully.")
+        return True
+
+    def _generate_progress(self, results, count):
+        # returns the number of failed chunks
+        done_students = done_projects = failed = 0
+        for result in results:
+            if result is None:
+                failed += 1
+                print("Warning: a chunk failed and was skipped (details in db_errors.log).")
+                continue
+            done_students += result[0]
+            done_projects += result[1]
+            print(f"  {done_students}/{count} students, {done_projects} projects")
+        return failed
+
+    def _generate_chunk(self, lo, hi, student_offset, supervisor_offset, supervisor_count,
+                        min_projects, max_projects, seed):
+        student_query = """
+            INSERT INTO public.student (student_id, name, email, "group")
             SELECT
+                %s + gs,
                 name,
-                department,
-                lower(replace(name, ' ', '.')) || '@lll.kpi.ua' AS email
+                lower(replace(name, ' ', '.')) || gs::text || '@lll.kpi.ua' AS email,
+                (%s::text[])[1 + floor(random() * %s)::int]  -- group
             FROM (
                 SELECT
-                    (ARRAY[%s, %s, %s, %s, %s])[ceil(random()*5)::int] AS name,
-                    (ARRAY[%s, %s, %s, %s, %s])[ceil(random()*5)::int] AS department
-                FROM generate_series(1, %s) AS gs
+                    gs,
+                    (%s::text[])[1 + floor(random() * %s)::int] AS name
+                FROM generate_series(%s, %s) AS gs
             ) t;
         """
-        self.execute(
-            supervisor_query,
-            (*supervisor_names, *departments, count)
-        )
-
-        project_query = """
+        project_query = f"""
             INSERT INTO public.project (title, start_date, status, grade, supervisor_id, student_id)
             SELECT
-                'Project #' || gs::text,
+                'Project #' || s.student_id::text || '-' || k::text,
                 start_date,
                 status,
                 CASE
@@ -255,34 +2083,47 @@ class Database:
                     ELSE NULL
                 END AS grade,
                 supervisor_id,
-                student_id
+                s.student_id
             FROM (
+                SELECT %s + gs AS student_id,
+                       %s + floor(random() * %s)::int AS projects
+                FROM generate_series(%s, %s) AS gs
+            ) s
+            CROSS JOIN LATERAL (
                 SELECT
-                    gs,
-                    date '2025-01-01' + ((random()*180)::int) * interval '1 day' AS start_date,
-                    (ARRAY['active', 'completed'])[ceil(random()*2)::int] AS status,
-                    s.supervisor_id,
-                    st.student_id
-                FROM generate_series(1, %s) AS gs
-                JOIN (
-                    SELECT supervisor_id,
-                           ROW_NUMBER() OVER (ORDER BY random()) AS rn
-                    FROM public.supervisor
-                ) s ON s.rn = gs
-                JOIN (
-                    SELECT student_id,
-                           ROW_NUMBER() OVER (ORDER BY random()) AS rn
-                    FROM public.student
-                ) st ON st.rn = gs
-            ) t;
+                    k,
+                    date '{GENERATE_START_DATE}' + ((random()*{GENERATE_DATE_SPAN})::int) * interval '1 day'
+                        AS start_date,
+                    (ARRAY['active', 'completed'])[1 + floor(random()*2)::int] AS status,
+                    %s + 1 + floor(random() * %s)::int AS supervisor_id
+                FROM generate_series(1, s.projects) AS k
+            ) p;
         """
-        self.execute(project_query, (count,))
-
-        self.sync_sequences('public.student', 'student_id')
-        self.sync_sequences('public.supervisor', 'supervisor_id')
-        self.sync_sequences('public.project', 'project_id')
-
-        print("Data generation completed successfully.")
+        with self.connection() as conn:
+            if conn is None:
+                print("Error: Database connection is not established.")
+                return None
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SET LOCAL statement_timeout = 0;")
+                    if seed is not None:
+                        cur.execute("SELECT setseed(%s);", (seed,))
+                    cur.execute(
+                        student_query,
+                        (student_offset, STUDENT_GROUPS, len(STUDENT_GROUPS),
+                         STUDENT_NAMES, len(STUDENT_NAMES), lo, hi)
+                    )
+                    cur.execute(
+                        project_query,
+                        (student_offset, min_projects, max_projects - min_projects + 1, lo, hi,
+                         supervisor_offset, supervisor_count)
+                    )
+                    projects = cur.rowcount
+                self._commit(conn)
+                return hi - lo + 1, projects
+            except Exception as e:
+                self._report_error(conn, e)
+                return None
 
     def sync_sequences(self, table_name, pk_column):
         try:
@@ -302,65 +2143,535 @@ class Database:
             logging.error("Error syncing sequence:\n" + traceback.format_exc())
             print("Warning: failed to automatically synchronize sequence (details in db_errors.log).")
 
-    def search_1_projects_by_grade_and_student_name(self, min_grade, max_grade, name_pattern):
-        query = """
-        SELECT p.project_id, p.title, p.grade, s.name AS student_name, s."group"
-        FROM public.project p
-        JOIN public.student s ON p.student_id = s.student_id
-        WHERE p.grade BETWEEN %s AND %s
-          AND s.name ILIKE %s
-        ORDER BY p.grade DESC;
-        """
+    def sync_all_sequences(self):
+        if not self._uses_server_functions():
+            for table, pk_column in CHANGE_LOG_TABLES.items():
+                self.sync_sequences(f"public.{table}", pk_column)
+            return
+        # setval() is not transactional, so like the client-side path there is nothing to commit
+        for table, _ in self.execute_prepared('sync_all_sequences', fetch=True, commit=False) or ():
+            print(f"Sequence for public.{table}.{CHANGE_LOG_TABLES[table]} synced to MAX+1.")
+
+    def _copy(self, sql, file, label, check=None):
+        with self.connection() as conn:
+            if conn is None:
+                print("Error: Database connection is not established.")
+                return None
+            metrics = self.metrics
+            start_time = time.monotonic()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SET LOCAL statement_timeout = 0;")
+                    cur.copy_expert(sql, file, size=COPY_BUFFER)
+                    rowcount = cur.rowcount
+                    if check is not None:
+                        cur.execute(check)
+                self._commit(conn)
+                if metrics is not None:
+                    metrics.observe(label, (time.monotonic() - start_time) * 1000, rowcount)
+                return rowcount
+            except Exception as e:
+                if metrics is not None:
+                    metrics.observe(label, (time.monotonic() - start_time) * 1000, error=error_kind(e))
+                self._report_error(conn, e)
+        return None
+
+    def export_table(self, table, file, fmt='csv'):
+        # COPY <table> TO fails on a partitioned table, COPY (SELECT ...) works before and after
+        # partition_projects()
+        columns = ", ".join(TABLE_COLUMNS[table])
+        return self._copy(
+            f"COPY (SELECT {columns} FROM public.{table}) TO STDOUT WITH ({COPY_FORMATS[fmt]});",
+            file,
+            'export_table'
+        )
+
+    def export_query(self, query, params, file, fmt='csv', label='export_query'):
+        with self.connection() as conn:
+            if conn is None:
+                print("Error: Database connection is not established.")
+                return None
+            with conn.cursor() as cur:
+                select_sql = cur.mogrify(query, params).decode(extensions.encodings[conn.encoding])
+        select_sql = select_sql.strip().rstrip(";")
+        return self._copy(f"COPY ({select_sql}) TO STDOUT WITH ({COPY_FORMATS[fmt]});", file, label)
+
+    def export_search(self, number, params, file, fmt='csv'):
+        query = SEARCH_QUERIES[number].format(keyset="TRUE")
+        return self.export_query(query, (*params, None), file, fmt, label='export_search')
+
+    def import_table(self, table, file, fmt='csv'):
+        columns = TABLE_COLUMNS[table]
+        check = PROJECT_DUPLICATE_CHECK if table == 'project' and self._projects_partitioned() else None
+        count = self._copy(
+            f"COPY public.{table} ({', '.join(columns)}) FROM STDIN WITH ({COPY_FORMATS[fmt]});",
+            file,
+            'import_table',
+            check
+        )
+        self._tables_changed((table,))
+        if count is not None:
+            self.sync_sequences(f"public.{table}", columns[0])
+            if table == 'project':
+                self.drain_project_default()
+        return count
+
+    def import_tables(self, files, fmt='csv'):
+        counts = {}
+        for table in IMPORT_ORDER:
+            if table not in files:
+                continue
+            count = self.import_table(table, files[table], fmt)
+            if count is None:
+                print(f"Import stopped at table {table}.")
+                break
+            counts[table] = count
+            print(f"Imported {count} rows into {table}.")
+        return counts
+
+    def index_status(self):
+        rows = self.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND indexname = ANY(%s);",
+            (list(INDEXES),), fetch=True
+        )
+        existing = {row[0] for row in rows}
+        return {name: name in existing for name in INDEXES}
+
+    @contextmanager
+    def without_statement_timeout(self):
+        # for maintenance that may legitimately outlast STATEMENT_TIMEOUT_MS
+        with self.connection():
+            self.execute("SET statement_timeout = 0;")
+            try:
+                yield self
+            finally:
+                self.execute("RESET statement_timeout;")
+
+    def create_indexes(self, names=None):
+        with self.without_statement_timeout():
+            self.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+            for name in names or INDEXES:
+                self.execute(f"CREATE INDEX IF NOT EXISTS {name} {INDEXES[name]};")
+            self.execute("ANALYZE public.student, public.supervisor, public.project;")
+        print("Indexes created.")
+
+    def drop_indexes(self, names=None):
+        for name in names or INDEXES:
+            self.execute(f"DROP INDEX IF EXISTS public.{name};")
+        self.execute("ANALYZE public.student, public.supervisor, public.project;")
+        print("Indexes dropped.")
+
+    def explain(self, name, params):
+        query = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + STATEMENTS[name]
+        rows = self.execute(query, params, fetch=True)
+        if not rows:
+            return None
+        plan = rows[0][0][0]
+        root = plan['Plan']
+        return {
+            'execution_ms': plan['Execution Time'],
+            'planning_ms': plan['Planning Time'],
+            'shared_hit': root.get('Shared Hit Blocks', 0),
+            'shared_read': root.get('Shared Read Blocks', 0),
+            'node': root['Node Type'],
+            'plan': plan,
+        }
+
+    def advise_indexes(self, search_params=None):
+        # run every search without and with the recommended indexes, then restore
+        # the index set that existed before
+        search_params = search_params or DEFAULT_SEARCH_PARAMS
+        existed = [name for name, present in self.index_status().items() if present]
+
+        self.drop_indexes()
+        without = {name: self.explain(name, (*params, None)) for name, params in search_params.items()}
+        self.create_indexes()
+        with_indexes = {name: self.explain(name, (*params, None)) for name, params in search_params.items()}
+
+        created = [name for name in INDEXES if name not in existed]
+        if created:
+            self.drop_indexes(created)
+
+        advice = {}
+        for name in search_params:
+            before, after = without[name], with_indexes[name]
+            if before is None or after is None:
+                continue
+            advice[name] = {
+                'without': before,
+                'with': after,
+                'speedup': before['execution_ms'] / after['execution_ms'] if after['execution_ms'] else None,
+            }
+        return advice
+
+    def run_script(self, statements):
+        # several statements in one transaction, all or nothing
+        with self.connection() as conn:
+            if conn is None:
+                print("Error: Database connection is not established.")
+                return False
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SET LOCAL statement_timeout = 0;")
+                    for statement in statements:
+                        cur.execute(statement)
+                self._commit(conn)
+                return True
+            except Exception as e:
+                self._report_error(conn, e)
+                return False
+
+    def install_student_stats(self):
+        if self.run_script(STUDENT_STATS_INSTALL + STUDENT_STATS_REBUILD):
+            self.student_stats = True
+            self._tables_changed(('project',))
+            print("Student stats summary installed; search 3 now reads from it.")
+
+    def rebuild_student_stats(self):
+        if self.run_script(STUDENT_STATS_REBUILD):
+            self._tables_changed(('project',))
+            print("Student stats summary rebuilt.")
+
+    def drop_student_stats(self):
+        if self.run_script(STUDENT_STATS_DROP):
+            self.student_stats = False
+            self._tables_changed(('project',))
+            print("Student stats summary dropped; search 3 aggregates project again.")
+
+    def check_student_stats(self):
+        # rows where the summary differs from the live aggregate; empty means consistent
+        if not self._uses_student_stats():
+            print("Student stats summary is not installed.")
+            return None
+        return self.execute(STUDENT_STATS_CHECK, fetch=True)
+
+    def _uses_student_stats(self):
+        if self.student_stats is None:
+            rows = self.execute(
+                "SELECT to_regclass('public.student_project_stats') IS NOT NULL "
+                "AND EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'student_project_stats_ins');",
+                fetch=True
+            )
+            if not rows:
+                return False
+            self.student_stats = rows[0][0]
+        return self.student_stats
+
+    def _uses_server_functions(self):
+        if self.server_functions is None:
+            rows = self.execute(
+                "SELECT to_regproc('public.delete_student_checked') IS NOT NULL "
+                "AND to_regproc('public.delete_supervisor_checked') IS NOT NULL "
+                "AND to_regproc('public.sync_all_sequences') IS NOT NULL "
+                "AND to_regproc('public.add_project_checked') IS NOT NULL;",
+                fetch=True
+            )
+            if not rows:
+                return False
+            self.server_functions = rows[0][0]
+        return self.server_functions
+
+    def server_functions_installed(self):
+        self.server_functions = None
+        return self._uses_server_functions()
+
+    def install_server_functions(self):
+        if self.run_script(SERVER_FUNCTIONS_INSTALL):
+            self.server_functions = True
+            print("Server-side functions installed.")
+
+    def drop_server_functions(self):
+        if self.run_script(SERVER_FUNCTIONS_DROP):
+            self.server_functions = False
+            print("Server-side functions dropped.")
+
+    def _commit_if(self, conn, changed):
+        # a server function that changed nothing leaves nothing to commit, which saves a round trip
+        if not changed:
+            return True
+        try:
+            self._commit(conn)
+            return True
+        except Exception as e:
+            self._report_error(conn, e)
+            return False
+
+    def _delete_checked(self, entity, row_id):
+        # related-project count and delete in one round trip, plus a commit only when deleted;
+        # the commit has to use the same pooled connection, which is rolled back when returned
+        with self.connection() as conn:
+            rows = self.execute_prepared(f'delete_{entity}_checked', (row_id,), fetch=True, commit=False)
+            if not self._commit_if(conn, rows and rows[0][1]):
+                return
+        if rows and rows[0][0] > 0:
+            print(
+                f"Error: Unable to delete {entity} (ID: {row_id}). "
+                f"He/She has {rows[0][0]} related projects."
+            )
+
+    def install_change_log(self):
+        if self.run_script(CHANGE_LOG_INSTALL):
+            print("Change log installed on student, supervisor and project.")
+
+    def drop_change_log(self):
+        if self.run_script(CHANGE_LOG_DROP):
+            print("Change log dropped.")
+
+    def change_log_installed(self):
+        rows = self.execute(
+            "SELECT to_regclass('public.change_log') IS NOT NULL "
+            "AND EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'change_log_project_ins');",
+            fetch=True
+        )
+        return bool(rows and rows[0][0])
+
+    def change_log_marker(self):
+        rows = self.execute("SELECT txid_snapshot_xmin(txid_current_snapshot());", fetch=True)
+        return rows[0][0] if rows else None
+
+    def change_log_since(self, marker):
+        # (new marker, {table: set of changed row ids, or None when the table was truncated})
+        rows = self.execute(CHANGE_LOG_SINCE, (marker,), fetch=True)
+        if not rows:
+            return None, {}
+        changes = {}
+        for _, table, row_id in rows:
+            if table is None:
+                continue
+            if row_id is None:
+                changes[table] = None
+            elif changes.get(table, ()) is not None:
+                changes.setdefault(table, set()).add(row_id)
+        return rows[0][0], changes
+
+    def prune_change_log(self, retention=CHANGE_LOG_RETENTION):
+        rows = self.execute(
+            "WITH pruned AS ("
+            "    DELETE FROM public.change_log"
+            "    WHERE changed_at < clock_timestamp() - make_interval(secs => %s)"
+            "    RETURNING 1"
+            ") SELECT COUNT(*) FROM pruned;",
+            (retention,),
+            fetch=True,
+            commit=True
+        )
+        return rows[0][0] if rows else None
+
+    def install_change_feed(self):
+        if self.run_script(CHANGE_FEED_INSTALL):
+            print(f"Change feed installed: writes to student, supervisor and project NOTIFY {CHANGE_FEED_CHANNEL}.")
+
+    def drop_change_feed(self):
+        if self.run_script(CHANGE_FEED_DROP):
+            print("Change feed dropped.")
+
+    def change_feed_installed(self):
+        rows = self.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'change_feed_project_ins');",
+            fetch=True
+        )
+        return bool(rows and rows[0][0])
+
+    def listen_changes(self, tables=None):
+        # LISTEN starts before the caller fetches its copy, so no change falls in between
+        feed = ChangeFeed(self.primary_params, tables)
+        feed.poll(0)
+        return feed
+
+    def rows_by_id(self, table, ids, report_time=False):
+        columns = ", ".join(TABLE_COLUMNS[table])
         return self.execute(
-            query,
-            (min_grade, max_grade, name_pattern),
+            f"SELECT {columns} FROM public.{table} WHERE {CHANGE_LOG_TABLES[table]} = ANY(%s);",
+            (list(ids),), fetch=True, report_time=report_time
+        )
+
+    def apply_change(self, rows, event):
+        # rows maps primary key -> row as fetched earlier; False means the table must be reloaded
+        ids = event['ids']
+        if ids is None:
+            return False
+        if event['op'] == 'DELETE':
+            for row_id in ids:
+                rows.pop(row_id, None)
+            return True
+        # a row deleted after this event is missing here and goes with its own DELETE event;
+        # only a failed fetch leaves the copy untrusted
+        fetched, duration_ms = self.rows_by_id(event['table'], ids, report_time=True)
+        if duration_ms is None:
+            return False
+        for row in fetched:
+            rows[row[0]] = row
+        return True
+
+    def _projects_partitioned(self):
+        if self.project_partitioned is None:
+            rows = self.execute(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.project'::regclass) "
+                "AND to_regprocedure('public.project_ensure_partitions(date, date)') IS NOT NULL;",
+                fetch=True
+            )
+            if not rows:
+                return False
+            self.project_partitioned = rows[0][0]
+        return self.project_partitioned
+
+    def partition_projects(self, interval='month'):
+        # converts public.project into a table range-partitioned by start_date
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Unknown partition interval: {interval}")
+        if self._projects_partitioned():
+            print("public.project is already partitioned.")
+            return False
+
+        unit, step = PARTITION_INTERVALS[interval]
+        indexes = [name for name, exists in self.index_status().items()
+                   if exists and INDEXES[name].startswith("ON public.project ")]
+        script = PARTITION_MIGRATION + [PARTITION_FUNCTION.format(unit=unit, step=step)] + PARTITION_MIGRATION_FINISH
+        # triggers go with the old table; both install scripts are idempotent
+        if self._uses_student_stats():
+            script += STUDENT_STATS_INSTALL
+        if self.change_log_installed():
+            script += CHANGE_LOG_INSTALL
+        if self.change_feed_installed():
+            script += CHANGE_FEED_INSTALL
+        if not self.run_script(script):
+            return False
+
+        self.project_partitioned = True
+        self._partitioned_dates.clear()
+        if indexes:
+            self.create_indexes(indexes)
+        self.sync_sequences('public.project', 'project_id')
+        self.execute("ANALYZE public.project;")
+        self._tables_changed(('project',))
+        print(f"public.project is now partitioned by start_date ({interval}ly ranges).")
+        print("The primary key is now (project_id, start_date); imports are checked for duplicate project ids.")
+        return True
+
+    def ensure_project_partitions(self, first_day, last_day=None):
+        if not self._projects_partitioned():
+            return 0
+        rows = self.execute(
+            "SELECT public.project_ensure_partitions(%s, %s);",
+            (first_day, last_day or first_day),
+            fetch=True,
+            commit=True
+        )
+        return rows[0][0] if rows else None
+
+    def _ensure_partitions_for(self, dates):
+        # a date without a partition would land in project_default, where searches cannot prune it
+        if not self._projects_partitioned():
+            return
+        dates = {date.fromisoformat(d) if isinstance(d, str) else d for d in dates if d is not None}
+        dates -= self._partitioned_dates
+        if dates and self._ensure_partitions_on(dates) is not None:
+            self._partitioned_dates.update(dates)
+
+    def _ensure_partitions_on(self, dates):
+        # each date's own interval only; MIN..MAX would also create every empty one in between
+        rows = self.execute(
+            "SELECT COALESCE(SUM(public.project_ensure_partitions(day, day)), 0)::integer "
+            "FROM unnest(%s::date[]) AS day;",
+            (sorted(dates),),
             fetch=True,
+            commit=True
+        )
+        return rows[0][0] if rows else None
+
+    def drain_project_default(self):
+        # COPY and the async engine insert without creating partitions first
+        if not self._projects_partitioned():
+            return 0
+        rows = self.execute("SELECT DISTINCT start_date FROM public.project_default;", fetch=True)
+        if not rows:
+            return 0
+        return self._ensure_partitions_on(row[0] for row in rows)
+
+    def project_partitions(self):
+        # (name, first day, day after the last one, estimated rows); the default partition has no bounds
+        partitions = []
+        for name, bound, rows in self.execute(PARTITIONS_QUERY, fetch=True):
+            match = PARTITION_BOUND.search(bound or "")
+            lower, upper = (date.fromisoformat(match[1]), date.fromisoformat(match[2])) if match else (None, None)
+            partitions.append((name, lower, upper, max(rows, 0)))
+        return partitions
+
+    def detach_project_partitions(self, before):
+        # partitions ending on or before `before` become standalone tables, without copying rows
+        names = [name for name, _, upper, _ in self.project_partitions() if upper is not None and upper <= before]
+        if not names:
+            print("No partitions to detach.")
+            return []
+        script = [f"ALTER TABLE public.project DETACH PARTITION public.{name};" for name in names]
+        # detaching fires no row triggers, so derived data is brought up to date explicitly
+        if self.change_log_installed():
+            script.append("INSERT INTO public.change_log (table_name, row_id) VALUES ('project', NULL);")
+        if self.change_feed_installed():
+            script.append(f"SELECT pg_notify('{CHANGE_FEED_CHANNEL}', "
+                          "json_build_object('table', 'project', 'op', 'TRUNCATE', 'ids', NULL)::text);")
+        if self._uses_student_stats():
+            script += STUDENT_STATS_REBUILD
+        if not self.run_script(script):
+            return []
+        self._partitioned_dates.clear()
+        self._tables_changed(('project',))
+        print(f"Detached {len(names)} partitions: {', '.join(names)}.")
+        return names
+
+    def search_1_projects_by_grade_and_student_name(self, min_grade, max_grade, name_pattern,
+                                                    page_size=None):
+        return self._select(
+            'search_1',
+            (min_grade, max_grade, name_pattern),
+            page_size=page_size,
             report_time=True
         )
 
-    def search_2_projects_by_date_and_supervisor_department(self, start_date, end_date, dept_pattern):
-        query = """
-        SELECT p.project_id, p.title, p.start_date, p.status,
-               sup.name AS supervisor_name, sup.department
-        FROM public.project p
-        JOIN public.supervisor sup ON p.supervisor_id = sup.supervisor_id
-        WHERE p.start_date BETWEEN %s AND %s
-          AND sup.department ILIKE %s
-        ORDER BY p.start_date;
-        """
-        return self.execute(
-            query,
+    def search_2_projects_by_date_and_supervisor_department(self, start_date, end_date, dept_pattern,
+                                                            page_size=None):
+        return self._select(
+            'search_2',
             (start_date, end_date, dept_pattern),
-            fetch=True,
+            page_size=page_size,
             report_time=True
         )
 
-    def search_3_students_stats_by_project_status(self, status_pattern, min_avg_grade):
-        query = """
-        SELECT
-            st.student_id,
-            st.name AS student_name,
-            st."group",
-            COUNT(p.project_id) AS total_projects,
-            AVG(p.grade) AS avg_grade
-        FROM public.student st
-        JOIN public.project p ON p.student_id = st.student_id
-        WHERE p.status ILIKE %s
-        GROUP BY st.student_id, st.name, st."group"
-        HAVING AVG(p.grade) >= %s
-        ORDER BY avg_grade DESC;
-        """
-        return self.execute(
-            query,
+    def search_3_students_stats_by_project_status(self, status_pattern, min_avg_grade,
+                                                  page_size=None):
+        return self._select(
+            'search_3_stats' if self._uses_student_stats() else 'search_3',
             (status_pattern, min_avg_grade),
-            fetch=True,
+            page_size=page_size,
             report_time=True
         )
 
 
     def close(self):
-        if self.cur:
-            self.cur.close()
         if self.conn:
             self.conn.close()
             print("Database connection closed.")
+        if self.pool:
+            self.pool.closeall()
+            print("Database connection pool closed.")
+        for replica in self.replicas:
+            replica['pool'].closeall()
+        self.disable_metrics()
+
+
+# code object of every public Database method -> its name, for metric labels; the generic
+# entry points are left out so the method that called them is found instead
+_worker_db = None
+
+
+def _init_generate_worker(primary_params):
+    global _worker_db
+    # the same database as the parent, not DB_PARAMS
+    _worker_db = Database(primary=primary_params)
+
+
+def _generate_chunk_worker(task):
+    # the worker connects on its first chunk; its connect and error messages are not shown,
+    # a failed chunk is counted by the parent and the details are in db_errors.log
+    with redirect_stdout(io.StringIO()):
+        return _worker_db._generate_chunk(*task)
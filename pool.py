@@ -0,0 +1,154 @@
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, timeout=30.0, health_check=True, **conn_params):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: min={minconn}, max={maxconn}")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check = health_check
+        self.conn_params = conn_params
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = set()
+        self._opening = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._replaced = 0
+        self._wait_ms = 0.0
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        return psycopg2.connect(**self.conn_params)
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start_time = time.monotonic()
+        deadline = start_time + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._in_use.add(conn)
+                    break
+                if self._size() < self.maxconn:
+                    conn = None
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"no free connection within {timeout:.1f}s "
+                        f"({len(self._in_use)}/{self.maxconn} in use)"
+                    )
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if conn is not None:
+                        self._in_use.add(conn)
+                    self._cond.notify()
+        elif not self._is_alive(conn):
+            conn.close()
+            try:
+                new_conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._in_use.discard(conn)
+                self._in_use.add(new_conn)
+                self._replaced += 1
+            conn = new_conn
+
+        with self._cond:
+            self._checkouts += 1
+            self._wait_ms += (time.monotonic() - start_time) * 1000
+        return conn
+
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed:
+            status = conn.get_transaction_status()
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if close or conn.closed or self._closed:
+                if not conn.closed:
+                    conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size(),
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "utilisation": len(self._in_use) / self.maxconn,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "replaced": self._replaced,
+                "avg_wait_ms": self._wait_ms / self._checkouts if self._checkouts else 0.0,
+            }
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            for conn in self._idle + list(self._in_use):
+                if not conn.closed:
+                    conn.close()
+            self._idle = []
+            self._in_use = set()
+            self._cond.notify_all()
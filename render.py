@@ -0,0 +1,265 @@
+import argparse
+import collections
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+OUTPUT_FORMATS = ('table', 'csv', 'jsonl')
+CHUNK_ROWS = 2000
+MAX_WIDTH = 40
+PAGER_KEEP = 20
+BENCH_ROWS = 200_000
+BENCH_REPEAT = 3
+
+
+def _decimal(value):
+    # AVG() and numeric division come back with many trailing digits; whole numbers are kept
+    # as they are, and only a value that rounds to .00 can be one
+    text = f"{value:.2f}"
+    return str(value) if text.endswith(".00") and value == value.to_integral_value() else text
+
+
+# exact type -> formatter; columns are formatted with one map() per type found in them
+FORMATTERS = {
+    str: str,
+    int: str,
+    type(None): lambda value: "",
+    Decimal: _decimal,
+    float: lambda value: f"{value:.2f}",
+    date: date.isoformat,
+    datetime: lambda value: value.isoformat(sep=" ", timespec="seconds"),
+    bool: str,
+}
+
+NUMERIC_TYPES = (int, float, Decimal)
+
+
+# types csv.writer already writes the way FORMATTERS would (str() of a date is isoformat())
+CSV_NATIVE = {str, int, bool, type(None), date}
+
+
+def format_value(value):
+    return FORMATTERS.get(type(value), str)(value)
+
+
+def json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def json_dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=json_value)
+
+
+def json_float(value):
+    # json.dumps writes repr() of a float, except for NaN and Infinity
+    return repr(value) if math.isfinite(value) else json_dumps(value)
+
+
+# exact type -> JSON text of a value, the same text json_dumps() gives
+JSON_ENCODERS = {
+    str: json.encoder.encode_basestring,
+    int: int.__repr__,
+    type(None): lambda value: "null",
+    bool: lambda value: "true" if value else "false",
+    float: json_float,
+    Decimal: lambda value: json_float(float(value)),
+    date: lambda value: '"' + value.isoformat() + '"',
+    datetime: lambda value: '"' + value.isoformat() + '"',
+}
+
+
+def map_column(values, formatters, fallback, native=frozenset()):
+    # a column with a single type is formatted by one map(); mixed columns look up each cell
+    types = set(map(type, values))
+    if types <= native:
+        return values
+    if len(types) == 1:
+        return list(map(formatters.get(types.pop(), fallback), values))
+    return list(map(lambda value: formatters.get(type(value), fallback)(value), values))
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Renderer:
+    def __init__(self, columns, fmt='table', out=None, chunk_rows=CHUNK_ROWS, max_width=MAX_WIDTH):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {fmt}")
+        self.columns = list(columns)
+        self.fmt = fmt
+        self.out = out or sys.stdout
+        self.chunk_rows = chunk_rows
+        self.max_width = max_width
+        self._layout = None
+
+    def write(self, rows, header=True):
+        # rows are consumed chunk by chunk, so a streaming source is never held in memory;
+        # each chunk goes to the output in a single write()
+        count = 0
+        for chunk in chunks(rows, self.chunk_rows):
+            if self.fmt == 'table':
+                text = self._table(chunk, header and count == 0)
+            elif self.fmt == 'csv':
+                text = self._csv(chunk, header and count == 0)
+            else:
+                text = self._jsonl(chunk)
+            self.out.write(text)
+            count += len(chunk)
+        self.out.flush()
+        return count
+
+    def _table(self, rows, header):
+        values = list(zip(*rows))
+        cells = [map_column(column, FORMATTERS, str, {str}) for column in values]
+        if self._layout is None:
+            # widths come from the first chunk so later chunks line up under the same header;
+            # longer values are cut to the column width
+            widths = [min(max(len(name), max(map(len, column))), self.max_width)
+                      for name, column in zip(self.columns, cells)]
+            numeric = [any(issubclass(t, NUMERIC_TYPES) for t in set(map(type, column))) for column in values]
+            template = " | ".join(f"%{'' if right else '-'}{w}.{w}s" for w, right in zip(widths, numeric))
+            self._layout = widths, template
+        widths, template = self._layout
+
+        lines = []
+        if header:
+            lines.append(" | ".join(f"{name:<{w}.{w}}" for name, w in zip(self.columns, widths)))
+            lines.append("-+-".join("-" * w for w in widths))
+        lines += [template % row for row in zip(*cells)]
+        lines.append("")
+        return "\n".join(lines)
+
+    def _csv(self, rows, header):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if header:
+            writer.writerow(self.columns)
+        writer.writerows(zip(*[map_column(column, FORMATTERS, str, CSV_NATIVE) for column in zip(*rows)]))
+        return buffer.getvalue()
+
+    def _jsonl(self, rows):
+        columns = self.columns
+        if len(set(columns)) < len(columns):
+            # repeated names collapse like keys of a dict
+            lines = [json_dumps(dict(zip(columns, row))) for row in rows]
+        else:
+            keys = [json_dumps(name).replace("%", "%%") for name in columns]
+            template = "{" + ", ".join(f"{key}: %s" for key in keys) + "}"
+            lines = [template % row for row in zip(*[map_column(column, JSON_ENCODERS, json_dumps)
+                                                     for column in zip(*rows)])]
+        lines.append("")
+        return "\n".join(lines)
+
+
+class Pager:
+    # pages of a streaming source are fetched on demand; the last `keep` of them stay in
+    # memory, so going back a few pages never re-runs the query and a long result never
+    # holds more than `keep` pages
+    def __init__(self, pages, keep=PAGER_KEEP):
+        self._source = iter(pages)
+        self._kept = collections.deque(maxlen=keep)
+        self.first = 0  # index of the oldest page still kept
+        self.count = 0  # pages fetched so far
+        self.exhausted = False
+
+    def get(self, index):
+        while self.count <= index and not self.exhausted:
+            page = next(self._source, None)
+            if not page:
+                self.exhausted = True
+                break
+            if len(self._kept) == self._kept.maxlen:
+                self.first += 1
+            self._kept.append(page)
+            self.count += 1
+        return self._kept[index - self.first] if self.first <= index < self.count else None
+
+    def remaining_rows(self, index):
+        # rows of page index and everything after it; pages not fetched yet are streamed
+        # through without being kept
+        for i in range(max(index, self.first), self.count):
+            yield from self._kept[i - self.first]
+        if not self.exhausted:
+            self._kept.clear()
+            for page in self._source:
+                self.count += 1
+                yield from page
+            self.first = self.count
+            self.exhausted = True
+
+
+def sample_rows(count, seed=42):
+    # shaped like search 1/3 results: ids, names, groups, grades and dates
+    rng = random.Random(seed)
+    names = ["Ivan Petrenko", "Maryna Kovalenko", "Oleh Shevchenko", "Anna Bondarenko"]
+    start = date(2025, 1, 1)
+    return [
+        (i, f"Project #{i}-{rng.randint(1, 5)}", rng.choice(names), f"КВ-{rng.randint(31, 35)}",
+         rng.randint(60, 100), Decimal(rng.randint(6000, 10000)) / Decimal(100),
+         start + timedelta(days=rng.randint(0, 180)))
+        for i in range(1, count + 1)
+    ]
+
+
+def _print_rows(rows, out):
+    # the old View.show_data: one print() of the tuple repr per row
+    for row in rows:
+        print(row, file=out)
+
+
+def benchmark(rows, columns, formats=OUTPUT_FORMATS, repeat=BENCH_REPEAT):
+    # best of `repeat` runs of each, so a busy machine skews the ratios less
+    runs = {'print': _print_rows}
+    for fmt in formats:
+        runs[fmt] = lambda rows, out, fmt=fmt: Renderer(columns, fmt, out=out).write(iter(rows))
+    results = {}
+    # line buffered like a terminal, where print() costs one write per row
+    with open(os.devnull, "w", buffering=1, encoding="utf-8") as devnull:
+        for name, run in runs.items():
+            best = None
+            for _ in range(repeat):
+                start_time = time.monotonic()
+                run(rows, devnull)
+                elapsed = time.monotonic() - start_time
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = len(rows) / best if best else None
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rows/sec of the table, CSV and JSON-lines renderers.")
+    parser.add_argument("--rows", type=int, default=BENCH_ROWS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=BENCH_REPEAT)
+    args = parser.parse_args(argv)
+
+    rows = sample_rows(args.rows, args.seed)
+    columns = ['project_id', 'title', 'student_name', 'group', 'grade', 'avg_grade', 'start_date']
+    results = benchmark(rows, columns, repeat=args.repeat)
+    baseline = results['print']
+    for name, rate in results.items():
+        speedup = f"{rate / baseline:.1f}x" if baseline and rate else "-"
+        print(f"{name:<6} {rate or 0:>12,.0f} rows/s  {speedup:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
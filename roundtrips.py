@@ -0,0 +1,140 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import date
+
+from psycopg2 import extensions
+
+from benchmark import percentile
+from model import DB_PARAMS, Database
+
+RUNS = 50
+WARMUP = 3
+MODES = ('client', 'server')
+
+
+class CountingCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        self.connection.round_trips += 1
+        return super().execute(query, vars)
+
+
+class CountingConnection(extensions.connection):
+    # every statement, and every commit or rollback of an open transaction, is one round trip
+    round_trips = 0
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        if self.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self.round_trips += 1
+        super().commit()
+
+    def rollback(self):
+        if self.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self.round_trips += 1
+        super().rollback()
+
+
+def operations(db):
+    # name -> (setup returning the call's arguments, or None; call)
+    rows = db.execute("SELECT student_id, supervisor_id FROM public.project LIMIT 1;", fetch=True)
+    if not rows:
+        return None
+    student_id, supervisor_id = rows[0]
+    tags = itertools.count(int(time.time()))
+    return {
+        'delete_student (has projects)': (None, lambda: db.delete_student(student_id)),
+        'delete_student (no projects)': (
+            lambda: (db.add_student('Round Trip', f"roundtrip{next(tags)}@lll.kpi.ua", 'КВ-31'),),
+            db.delete_student,
+        ),
+        'delete_supervisor (has projects)': (None, lambda: db.delete_supervisor(supervisor_id)),
+        'sync_sequences (3 tables)': (None, db.sync_all_sequences),
+        'add_project (missing student)': (
+            None, lambda: db.add_project('Round trip', date(2025, 1, 1), 'active', None, supervisor_id, 0)
+        ),
+    }
+
+
+def measure(db, setup, call, runs, warmup):
+    timings = []
+    trips = []
+    for i in range(warmup + runs):
+        args = setup() if setup else ()
+        before = db.conn.round_trips
+        start_time = time.perf_counter()
+        call(*args)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        if i >= warmup:
+            timings.append(duration_ms)
+            trips.append(db.conn.round_trips - before)
+    return {
+        'round_trips': sum(trips) / len(trips),
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'mean_ms': sum(timings) / len(timings),
+    }
+
+
+def run(db, runs=RUNS, warmup=WARMUP):
+    ops = operations(db)
+    if ops is None:
+        return None
+    report = {}
+    for mode in MODES:
+        # the flag Database autodetects; forcing it picks the code path
+        db.server_functions = mode == 'server'
+        for name, (setup, call) in ops.items():
+            report.setdefault(name, {})[mode] = measure(db, setup, call, runs, warmup)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Round trips and latency of client-side vs server-function code paths."
+    )
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    # needs generated data; the server functions are installed if missing and left in place
+    db = Database(primary={**DB_PARAMS, 'connection_factory': CountingConnection})
+    try:
+        if not db.connect():
+            print("Error: Failed to connect to database (details in db_errors.log).", file=sys.stderr)
+            return 1
+        if not db.server_functions_installed():
+            db.install_server_functions()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            report = run(db, args.runs, args.warmup)
+    finally:
+        db.close()
+    if report is None:
+        print("Error: no projects to benchmark against; generate data first.", file=sys.stderr)
+        return 1
+
+    print(f"{'operation':<34} {'round trips':>17} {'p50, ms':>17} {'p95, ms':>17}")
+    for name, modes in report.items():
+        client, server = modes['client'], modes['server']
+        print(
+            f"{name:<34} {client['round_trips']:>7.1f} -> {server['round_trips']:<6.1f} "
+            f"{client['p50_ms']:>7.2f} -> {server['p50_ms']:<6.2f} "
+            f"{client['p95_ms']:>7.2f} -> {server['p95_ms']:<6.2f}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
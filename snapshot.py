@@ -0,0 +1,511 @@
+import argparse
+import functools
+import logging
+import math
+import re
+import sys
+import time
+import traceback
+from datetime import date
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from benchmark import PARAM_MATRIX, SEARCH_METHODS
+from model import CHANGE_LOG_RETENTION, CHANGE_LOG_TABLES, Database
+
+# stands in for NULL in integer columns; no id or grade takes this value
+NULL_INT = -2 ** 31
+# seconds between change log prunes done by a snapshot
+PRUNE_INTERVAL = 300.0
+
+SNAPSHOT_QUERIES = {
+    'student': 'SELECT student_id, name, "group" FROM public.student',
+    'supervisor': 'SELECT supervisor_id, name, department FROM public.supervisor',
+    'project': """
+        SELECT project_id, title, start_date, status, grade, supervisor_id, student_id
+        FROM public.project
+    """,
+}
+
+# columns after the primary key, in SNAPSHOT_QUERIES order
+SNAPSHOT_COLUMNS = {
+    'student': (('name', 'text'), ('group', 'text')),
+    'supervisor': (('name', 'text'), ('department', 'text')),
+    'project': (('title', 'text'), ('start_date', 'date'), ('status', 'text'), ('grade', 'int'),
+                ('supervisor_id', 'int'), ('student_id', 'int')),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def like_regex(pattern):
+    # ILIKE pattern -> regex: % and _ are wildcards, backslash escapes the next character
+    parts = []
+    chars = iter(pattern)
+    for ch in chars:
+        if ch == '\\':
+            parts.append(re.escape(next(chars, '\\')))
+        elif ch == '%':
+            parts.append('.*')
+        elif ch == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(ch))
+    return re.compile(''.join(parts), re.IGNORECASE | re.DOTALL)
+
+
+class Dictionary:
+    # distinct strings of a column; rows store int32 codes into `values`
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self._objects = None
+
+    def encode(self, values):
+        codes = self.codes
+        out = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+                self._objects = None
+            out[i] = code
+        return out
+
+    def decode(self, codes):
+        if self._objects is None:
+            self._objects = np.array(self.values, dtype=object)
+        return self._objects[codes].tolist()
+
+    def match(self, pattern):
+        # the pattern is tested once per distinct value, not once per row
+        regex = like_regex(pattern)
+        return np.fromiter(
+            (value is not None and regex.fullmatch(value) is not None for value in self.values),
+            dtype=bool,
+            count=len(self.values)
+        )
+
+
+class SnapshotTable:
+    def __init__(self, columns):
+        self.columns = columns
+        self.dictionaries = {}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.data = {}
+        self.load([])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _arrays(self, rows):
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        data = {}
+        for i, (column, kind) in enumerate(self.columns, 1):
+            values = [row[i] for row in rows]
+            if kind == 'text':
+                data[column] = self.dictionaries[column].encode(values)
+            elif kind == 'date':
+                data[column] = np.array(values, dtype='datetime64[D]')
+            else:
+                data[column] = np.array([NULL_INT if v is None else v for v in values], dtype=np.int32)
+        return ids, data
+
+    def load(self, rows):
+        # rows come ordered by primary key
+        self.dictionaries = {column: Dictionary() for column, kind in self.columns if kind == 'text'}
+        self.ids, self.data = self._arrays(rows)
+
+    def replace(self, ids, rows):
+        # drop every changed id, then add back the rows that still exist
+        keep = ~np.isin(self.ids, np.fromiter(ids, dtype=np.int64, count=len(ids)))
+        new_ids, new_data = self._arrays(rows)
+        all_ids = np.concatenate([self.ids[keep], new_ids])
+        order = np.argsort(all_ids, kind='stable')
+        self.ids = all_ids[order]
+        for column in self.data:
+            self.data[column] = np.concatenate([self.data[column][keep], new_data[column]])[order]
+
+    def positions(self, ids):
+        # row positions of ids in this table and whether each one was found
+        if not len(self.ids):
+            return np.zeros(len(ids), dtype=np.intp), np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return pos, self.ids[pos] == ids
+
+    def decode(self, column, positions):
+        return self.dictionaries[column].decode(self.data[column][positions])
+
+    def match(self, column, pattern):
+        # per row: does the text column match the ILIKE pattern
+        return self.dictionaries[column].match(pattern)[self.data[column]]
+
+
+class Snapshot:
+    # read-only in-memory copy of student, supervisor and project that answers the three
+    # searches without a round trip; refresh() catches up through the change log
+    def __init__(self, db):
+        if np is None:
+            raise ImportError("The snapshot engine needs numpy (pip install numpy).")
+        self.db = db
+        self.tables = {name: SnapshotTable(columns) for name, columns in SNAPSHOT_COLUMNS.items()}
+        self.marker = None
+        self.refreshed_at = None
+        self.pruned_at = None
+        self.change_log = False
+        self._joins = {}
+
+    def _fetch(self, table, ids=None):
+        pk = CHANGE_LOG_TABLES[table]
+        query = SNAPSHOT_QUERIES[table]
+        if ids is None:
+            return list(self.db.stream(f"{query} ORDER BY {pk};"))
+        return list(self.db.stream(f"{query} WHERE {pk} = ANY(%s) ORDER BY {pk};", (sorted(ids),)))
+
+    def load(self):
+        start_time = time.monotonic()
+        self.change_log = self.db.change_log_installed()
+        if not self.change_log:
+            print("Change log is not installed: every refresh will reload the snapshot.")
+        try:
+            # one snapshot for the marker and all three tables
+            tables = {name: SnapshotTable(columns) for name, columns in SNAPSHOT_COLUMNS.items()}
+            with self.db.transaction(isolation_level='repeatable read'):
+                marker = self.db.change_log_marker() if self.change_log else None
+                for name, table in tables.items():
+                    table.load(self._fetch(name))
+        except Exception:
+            logging.error("Error loading snapshot:\n" + traceback.format_exc())
+            print("Error: snapshot was not loaded (details in db_errors.log).")
+            return False
+
+        self.tables = tables
+        self.marker = marker
+        self.refreshed_at = time.monotonic()
+        self._joins = {}
+        print(
+            f"Snapshot loaded: {len(self.tables['student'])} students, "
+            f"{len(self.tables['supervisor'])} supervisors, {len(self.tables['project'])} projects "
+            f"in {(time.monotonic() - start_time) * 1000:.0f} ms."
+        )
+        self._prune()
+        return True
+
+    def refresh(self):
+        # pruning keeps CHANGE_LOG_RETENTION seconds of changes; an older snapshot may have missed some
+        if (self.marker is None or not self.change_log
+                or time.monotonic() - self.refreshed_at > CHANGE_LOG_RETENTION / 2):
+            return self.load()
+
+        try:
+            with self.db.transaction(isolation_level='repeatable read'):
+                marker, changes = self.db.change_log_since(self.marker)
+                for name, ids in changes.items():
+                    if ids is None:
+                        self.tables[name].load(self._fetch(name))
+                    else:
+                        self.tables[name].replace(ids, self._fetch(name, ids))
+        except Exception:
+            # the marker stays put, so the next refresh re-applies the same changes
+            logging.error("Error refreshing snapshot:\n" + traceback.format_exc())
+            print("Error: snapshot was not refreshed (details in db_errors.log).")
+            return False
+
+        self.marker = marker
+        self.refreshed_at = time.monotonic()
+        if changes:
+            self._joins = {}
+        self._prune()
+        return True
+
+    def _prune(self):
+        # every write adds change log rows; without this the table grows forever
+        if not self.change_log:
+            return
+        if self.pruned_at is not None and time.monotonic() - self.pruned_at < PRUNE_INTERVAL:
+            return
+        self.db.prune_change_log()
+        self.pruned_at = time.monotonic()
+
+    def _join(self, table, column):
+        # positions of the referenced rows for every project, kept until the next refresh
+        if column not in self._joins:
+            self._joins[column] = self.tables[table].positions(self.tables['project'].data[column])
+        return self._joins[column]
+
+    def search_1_projects_by_grade_and_student_name(self, min_grade, max_grade, name_pattern):
+        start_time = time.monotonic()
+        projects, students = self.tables['project'], self.tables['student']
+        student_pos, found = self._join('student', 'student_id')
+        grade = projects.data['grade']
+
+        mask = found & (grade != NULL_INT) & (grade >= min_grade) & (grade <= max_grade)
+        mask[mask] = students.match('name', name_pattern)[student_pos[mask]]
+        idx = np.flatnonzero(mask)
+        idx = idx[np.lexsort((-projects.ids[idx], -grade[idx]))]
+
+        pos = student_pos[idx]
+        rows = list(zip(
+            projects.ids[idx].tolist(),
+            projects.decode('title', idx),
+            grade[idx].tolist(),
+            students.decode('name', pos),
+            students.decode('group', pos),
+        ))
+        return rows, (time.monotonic() - start_time) * 1000
+
+    def search_2_projects_by_date_and_supervisor_department(self, start_date, end_date, dept_pattern):
+        start_time = time.monotonic()
+        projects, supervisors = self.tables['project'], self.tables['supervisor']
+        supervisor_pos, found = self._join('supervisor', 'supervisor_id')
+        dates = projects.data['start_date']
+
+        mask = (found & (dates >= np.datetime64(start_date, 'D'))
+                & (dates <= np.datetime64(end_date, 'D')))
+        mask[mask] = supervisors.match('department', dept_pattern)[supervisor_pos[mask]]
+        idx = np.flatnonzero(mask)
+        idx = idx[np.lexsort((projects.ids[idx], dates[idx]))]
+
+        pos = supervisor_pos[idx]
+        rows = list(zip(
+            projects.ids[idx].tolist(),
+            projects.decode('title', idx),
+            dates[idx].tolist(),
+            projects.decode('status', idx),
+            supervisors.decode('name', pos),
+            supervisors.decode('department', pos),
+        ))
+        return rows, (time.monotonic() - start_time) * 1000
+
+    def search_3_students_stats_by_project_status(self, status_pattern, min_avg_grade):
+        start_time = time.monotonic()
+        projects, students = self.tables['project'], self.tables['student']
+        student_pos, found = self._join('student', 'student_id')
+
+        mask = found & projects.match('status', status_pattern)
+        pos = student_pos[mask]
+        grade = projects.data['grade'][mask]
+        graded = grade != NULL_INT
+        n = len(students)
+        counts = np.bincount(pos, minlength=n)
+        graded_counts = np.bincount(pos, weights=graded, minlength=n)
+        grade_sums = np.bincount(pos, weights=np.where(graded, grade, 0), minlength=n)
+
+        # AVG(grade) >= min without dividing, so boundary averages compare exactly
+        keep = (graded_counts > 0) & (grade_sums >= float(min_avg_grade) * graded_counts)
+        idx = np.flatnonzero(keep)
+        avg = grade_sums[idx] / graded_counts[idx]
+        order = np.lexsort((-students.ids[idx], -avg))
+        idx, avg = idx[order], avg[order]
+
+        rows = list(zip(
+            students.ids[idx].tolist(),
+            students.decode('name', idx),
+            students.decode('group', idx),
+            counts[idx].tolist(),
+            avg.tolist(),
+        ))
+        return rows, (time.monotonic() - start_time) * 1000
+
+
+def same_rows(sql_rows, snapshot_rows):
+    # AVG comes back from PostgreSQL as numeric and from the snapshot as float
+    if len(sql_rows) != len(snapshot_rows):
+        return False
+    for sql_row, snapshot_row in zip(sql_rows, snapshot_rows):
+        if len(sql_row) != len(snapshot_row):
+            return False
+        for a, b in zip(sql_row, snapshot_row):
+            if isinstance(b, float):
+                if a is None or not math.isclose(float(a), b, rel_tol=1e-9):
+                    return False
+            elif a != b:
+                return False
+    return True
+
+
+def verify(db, snapshot, matrix):
+    # runs every case against PostgreSQL and the snapshot; returns the cases that differ
+    mismatches = []
+    for search, cases in matrix.items():
+        method = SEARCH_METHODS[search]
+        for params in cases:
+            sql_rows, sql_ms = getattr(db, method)(*params)
+            snapshot_rows, snapshot_ms = getattr(snapshot, method)(*params)
+            ok = sql_ms is not None and same_rows(sql_rows, snapshot_rows)
+            print(
+                f"  {search}{tuple(str(p) for p in params)}: {len(snapshot_rows)} rows, "
+                f"sql {sql_ms or 0:.2f} ms, snapshot {snapshot_ms:.2f} ms"
+                + ("" if ok else "  MISMATCH")
+            )
+            if not ok:
+                mismatches.append((search, params))
+    return mismatches
+
+
+def verify_refresh(db, snapshot, matrix):
+    # writes that every search sees, refresh() instead of a reload, then verify; the rows
+    # are deleted again and checked once more, so the incremental path is exercised both ways
+    if not snapshot.change_log or not len(snapshot.tables['supervisor']):
+        print("Skipping the refresh check: it needs the change log and at least one supervisor.")
+        return []
+    supervisor_id = int(snapshot.tables['supervisor'].ids[0])
+    tag = int(time.time() * 1000)
+    student_id = db.add_student('Ivan Snapshotcheck', f"snapshot.check{tag}@lll.kpi.ua", 'КВ-31')
+    if student_id is None:
+        return [('refresh', 'add_student')]
+    project_id = db.add_project(f"Snapshot check {tag}", matrix['search_2'][0][0], 'completed', 95,
+                                supervisor_id, student_id)
+    mismatches = [] if project_id is not None else [('refresh', 'add_project')]
+    try:
+        if project_id is not None:
+            db.edit_project(project_id, f"Snapshot check {tag}", matrix['search_2'][0][0],
+                            'completed', 99, supervisor_id, student_id)
+        print("After writes:")
+        if not snapshot.refresh():
+            return [('refresh', 'writes')]
+        mismatches += verify(db, snapshot, matrix)
+    finally:
+        if project_id is not None:
+            db.delete_project(project_id)
+        db.delete_student(student_id)
+    print("After deletes:")
+    if not snapshot.refresh():
+        return mismatches + [('refresh', 'deletes')]
+    return mismatches + verify(db, snapshot, matrix)
+
+
+# fixed rows for offline_checks(): two projects tie on grade, two students tie on average
+# and one student's average sits exactly on the search 3 boundary
+FIXED_ROWS = {
+    'student': [(1, 'Ivan Adamenko', 'КВ-31'), (2, 'Maryna Bondar', 'КВ-32'),
+                (3, 'Ivan Chornyi', 'КВ-33'), (4, 'Olena Dovha', 'КВ-31')],
+    'supervisor': [(1, 'Petro Sydorenko', 'FIOT'), (2, 'Iryna Koval', 'FPM')],
+    'project': [
+        (1, 'P1', date(2025, 1, 5), 'completed', 90, 1, 1),
+        (2, 'P2', date(2025, 1, 5), 'completed', 90, 2, 3),
+        (3, 'P3', date(2025, 1, 3), 'active', None, 1, 2),
+        (4, 'P4', date(2025, 1, 5), 'completed', 75, 2, 1),
+        (5, 'P5', date(2025, 2, 1), 'completed', 80, 1, 3),
+        (6, 'P6', date(2025, 3, 1), 'completed', 85, 2, 4),
+    ],
+}
+
+# (search, params, rows PostgreSQL returns for FIXED_ROWS)
+FIXED_CASES = [
+    # grade DESC, then project_id DESC between P1 and P2
+    ('search_1', (60, 100, '%ivan%'), [
+        (2, 'P2', 90, 'Ivan Chornyi', 'КВ-33'), (1, 'P1', 90, 'Ivan Adamenko', 'КВ-31'),
+        (5, 'P5', 80, 'Ivan Chornyi', 'КВ-33'), (4, 'P4', 75, 'Ivan Adamenko', 'КВ-31'),
+    ]),
+    ('search_1', (80, 90, 'Ivan_C%'), [
+        (2, 'P2', 90, 'Ivan Chornyi', 'КВ-33'), (5, 'P5', 80, 'Ivan Chornyi', 'КВ-33'),
+    ]),
+    # start_date, then project_id between the three projects of 2025-01-05
+    ('search_2', (date(2025, 1, 1), date(2025, 1, 31), 'F%'), [
+        (3, 'P3', date(2025, 1, 3), 'active', 'Petro Sydorenko', 'FIOT'),
+        (1, 'P1', date(2025, 1, 5), 'completed', 'Petro Sydorenko', 'FIOT'),
+        (2, 'P2', date(2025, 1, 5), 'completed', 'Iryna Koval', 'FPM'),
+        (4, 'P4', date(2025, 1, 5), 'completed', 'Iryna Koval', 'FPM'),
+    ]),
+    ('search_2', (date(2025, 1, 6), date(2025, 3, 1), 'fpm'), [
+        (6, 'P6', date(2025, 3, 1), 'completed', 'Iryna Koval', 'FPM'),
+    ]),
+    # AVG(grade) >= 82.5 keeps student 1 (exactly 82.5); 4 and 3 tie at 85, student_id DESC
+    ('search_3', ('completed', Decimal('82.5')), [
+        (4, 'Olena Dovha', 'КВ-31', 1, 85.0), (3, 'Ivan Chornyi', 'КВ-33', 2, 85.0),
+        (1, 'Ivan Adamenko', 'КВ-31', 2, 82.5),
+    ]),
+    ('search_3', ('completed', Decimal('82.51')), [
+        (4, 'Olena Dovha', 'КВ-31', 1, 85.0), (3, 'Ivan Chornyi', 'КВ-33', 2, 85.0),
+    ]),
+    # student 2 has only an ungraded project, so no average and no row
+    ('search_3', ('%', 0), [
+        (4, 'Olena Dovha', 'КВ-31', 1, 85.0), (3, 'Ivan Chornyi', 'КВ-33', 2, 85.0),
+        (1, 'Ivan Adamenko', 'КВ-31', 2, 82.5),
+    ]),
+]
+
+# (ILIKE pattern, value, whether PostgreSQL matches)
+LIKE_CASES = [
+    ('%Ivan%', 'Ivan Petrenko', True),
+    ('ivan%', 'IVAN P', True),
+    ('a_c', 'abc', True),
+    ('a_c', 'abbc', False),
+    ('a%', 'a\nb', True),
+    ('100\\%', '100%', True),
+    ('100\\%', '1000', False),
+    ('a\\_c', 'a_c', True),
+    ('a\\_c', 'abc', False),
+    ('a.c', 'abc', False),
+    ('(x)', '(X)', True),
+    ('', '', True),
+    ('%', None, False),
+]
+
+
+def offline_checks():
+    # the snapshot engine against hand-checked results, without a database
+    failures = []
+    for pattern, value, expected in LIKE_CASES:
+        matched = value is not None and like_regex(pattern).fullmatch(value) is not None
+        if matched != expected:
+            failures.append(f"like_regex({pattern!r}) on {value!r}: {matched}, expected {expected}")
+
+    snapshot = Snapshot(None)
+    for name, table in snapshot.tables.items():
+        table.load(FIXED_ROWS[name])
+    for search, params, expected in FIXED_CASES:
+        rows, _ = getattr(snapshot, SEARCH_METHODS[search])(*params)
+        if not same_rows(expected, rows):
+            failures.append(f"{search}{params}: {rows}, expected {expected}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the in-memory snapshot against the SQL searches.")
+    parser.add_argument("--install-change-log", action="store_true",
+                        help="install the change log triggers before loading")
+    parser.add_argument("--offline", action="store_true",
+                        help="only run the checks on fixed rows; no database is used")
+    parser.add_argument("--check-refresh", action="store_true",
+                        help="also insert, edit and delete a test student and project, checking "
+                             "the results after each refresh()")
+    args = parser.parse_args(argv)
+
+    failures = offline_checks()
+    for failure in failures:
+        print(f"  MISMATCH {failure}")
+    print(f"Offline checks: {len(LIKE_CASES) + len(FIXED_CASES) - len(failures)} passed, "
+          f"{len(failures)} failed.")
+    if failures:
+        return 1
+    if args.offline:
+        return 0
+
+    db = Database()
+    try:
+        if args.install_change_log:
+            db.install_change_log()
+        snapshot = Snapshot(db)
+        if not snapshot.load():
+            return 1
+        mismatches = verify(db, snapshot, PARAM_MATRIX)
+        if args.check_refresh:
+            # writes to the database DB_PARAMS points at, so only on request
+            mismatches += verify_refresh(db, snapshot, PARAM_MATRIX)
+    finally:
+        db.close()
+
+    if mismatches:
+        print(f"{len(mismatches)} case(s) differ from the SQL results.")
+        return 1
+    print("Snapshot results match the SQL searches.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,11 @@
+import sys
+
+from render import OUTPUT_FORMATS, Pager, Renderer
+
+
 class View:
+    output_format = 'table'
+
     @staticmethod
     def show_menu():
         print("\n=== MAIN MENU ===")
@@ -9,12 +16,134 @@ class View:
         print("14. Search: grade range + student name")
         print("15. Search: date range + supervisor department")
         print("16. Search: student stats by project status")
+        print("17. Import / export data (COPY)")
+        print("18. Enable / disable result cache")
+        print("19. Indexes: status / create / drop / advisor")
+        print("20. Slow query log")
+        print("21. Student stats summary for search 16")
+        print("22. Project partitions by start date")
+        print("23. Query metrics")
+        print("24. Live change feed (LISTEN/NOTIFY)")
+        print("25. Server-side functions for deletes, sequence sync and project insert")
         print("0. Exit")
 
     @staticmethod
-    def show_data(data):
+    def columns_for(rows, columns):
+        # headers from cursor.description; numbered when the source did not provide any
+        if callable(columns):
+            columns = columns()
+        return list(columns) if columns else [f"column_{i}" for i in range(1, len(rows[0]) + 1)]
+
+    @staticmethod
+    def show_data(data, columns=None):
         if not data:
             print("No data.")
             return
-        for row in data:
-            print(row)
+        Renderer(View.columns_for(data, columns), View.output_format).write(data)
+
+    @staticmethod
+    def show_pages(pages, columns=None):
+        # columns may be a callable, read once the first page has been fetched
+        pager = Pager(pages)
+        page = pager.get(0)
+        if not page:
+            print("No data.")
+            return
+        columns = View.columns_for(page, columns)
+        if not sys.stdout.isatty():
+            # piped or redirected: everything, no prompts
+            Renderer(columns, View.output_format).write(pager.remaining_rows(0))
+            return
+
+        index = 0
+        while True:
+            Renderer(columns, View.output_format).write(page)
+            total = f"{pager.count}" if pager.exhausted else f"{pager.count}+"
+            command = input(
+                f"-- page {index + 1}/{total}. Enter: next, p: prev, <n>: go to page, "
+                f"a: all remaining, f table|csv|jsonl: format, q: stop -- "
+            ).strip().lower()
+            if command == "q":
+                break
+            if command == "a":
+                Renderer(columns, View.output_format).write(pager.remaining_rows(index + 1))
+                break
+            if command.startswith("f"):
+                fmt = command[1:].strip()
+                if fmt in OUTPUT_FORMATS:
+                    View.output_format = fmt
+                else:
+                    print(f"Unknown format. Use {', '.join(OUTPUT_FORMATS)}.")
+                continue
+            if command == "p":
+                target = max(index - 1, 0)
+            elif command.isdigit():
+                target = int(command) - 1
+            else:
+                target = index + 1
+            next_page = pager.get(target)
+            if next_page is None:
+                if 0 <= target < pager.first:
+                    print(f"Page {target + 1} is no longer kept; pages {pager.first + 1}..{pager.count} are.")
+                    continue
+                if command.isdigit():
+                    print(f"No page {command}; there are {pager.count}.")
+                    continue
+                break
+            index, page = target, next_page
+
+    @staticmethod
+    def show_index_advice(advice):
+        if not advice:
+            print("No data.")
+            return
+        print(f"{'query':<10} {'no index, ms':>13} {'indexed, ms':>12} {'speedup':>8}  plan (no index -> indexed)")
+        for name, item in advice.items():
+            before, after = item['without'], item['with']
+            speedup = f"{item['speedup']:.1f}x" if item['speedup'] else "-"
+            print(
+                f"{name:<10} {before['execution_ms']:>13.2f} {after['execution_ms']:>12.2f} {speedup:>8}  "
+                f"{before['node']} -> {after['node']}"
+            )
+
+    @staticmethod
+    def show_slow_queries(entries):
+        if not entries:
+            print("No slow queries recorded.")
+            return
+        for i, entry in enumerate(entries, 1):
+            print(f"\n#{i} {entry['duration_ms']:.2f} ms, {entry['rows']} rows, at {entry['at']}")
+            print(f"   {entry['query'][:200]}")
+            if entry['params']:
+                print(f"   params: {', '.join(entry['params'])}")
+            plan = entry['plan']
+            if plan:
+                root = plan['Plan']
+                line = f"   plan: {root['Node Type']}, est. cost {root['Total Cost']}"
+                if 'Execution Time' in plan:
+                    line += f", re-run {plan['Execution Time']:.2f} ms"
+                print(line)
+
+    @staticmethod
+    def show_metrics(snapshot):
+        if not snapshot or not snapshot['methods']:
+            print("No metrics recorded.")
+            return
+        print(f"{'method':<45} {'calls':>7} {'errors':>7} {'rows':>9} {'avg, ms':>9} {'total, ms':>10}")
+        for method, item in snapshot['methods'].items():
+            print(
+                f"{method:<45} {item['calls']:>7} {sum(item['errors'].values()):>7} {item['rows']:>9} "
+                f"{item['avg_ms'] or 0:>9.2f} {item['total_ms']:>10.2f}"
+            )
+
+    @staticmethod
+    def show_change(event, rows, columns=None):
+        ids = event['ids']
+        if ids is None:
+            changed = "whole table reloaded"
+        else:
+            shown = ", ".join(str(row_id) for row_id in ids[:10])
+            changed = f"ids {shown}" + (f" (+{len(ids) - 10} more)" if len(ids) > 10 else "")
+        print(f"{event['table']} {event['op']}: {changed}; {len(rows)} rows in view")
+        if ids and event['op'] != 'DELETE':
+            View.show_data([rows[row_id] for row_id in ids[:10] if row_id in rows], columns)